@@ -15,16 +15,56 @@ To deploy to Streamlit Cloud:
     3. Set data folder path in secrets if needed
 """
 
+import io
+import copy
+import os
+import re
+import json
+import hashlib
+import functools
+import logging
+import time
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
+from streamlit.logger import get_logger
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import pandas as pd
 import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-from sklearn.metrics import confusion_matrix, roc_curve, auc, precision_recall_curve
+import plotly.io as pio
+# sklearn, scipy and plotly.subplots are imported where used, so a process
+# only pays for them once a page needs them
 import warnings
 warnings.filterwarnings('ignore')
 
+# Streamlit's logger setup, so app messages follow --logger.level
+logger = get_logger(__name__)
+
+# Datasets are shared between sessions and handed out as shallow views, which
+# relies on copy-on-write (always on from pandas 3)
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option('mode.copy_on_write', True)
+
+# Render every page once in the background when the server starts serving
+# (NOVAMART_WARMUP=0 turns it off)
+WARM_UP = os.environ.get("NOVAMART_WARMUP", "1") != "0"
+
+# Data path - can be overridden with the NOVAMART_DATA_DIR environment variable
+DATA_DIR = os.environ.get("NOVAMART_DATA_DIR", "data")
+CACHE_DIR = os.path.join(DATA_DIR, ".cache")
+CACHE_FORMAT_VERSION = 1
+# Columnar cache file type: "parquet" (compressed, default) or "arrow" (Arrow IPC
+# files that are memory-mapped, so worker processes on a host share their pages)
+CACHE_STORE = os.environ.get("NOVAMART_CACHE_STORE", "parquet")
+# Aggregation backend: "pandas" (default) or "duckdb", which queries the CSV
+# files directly so tables larger than memory can be served
+QUERY_BACKEND = os.environ.get("NOVAMART_BACKEND", "pandas")
+
 # =============================================================================
 # PAGE CONFIG
 # =============================================================================
@@ -45,39 +85,1605 @@ st.markdown("""
     """, unsafe_allow_html=True)
 
 # =============================================================================
-# DATA LOADING (with caching)
+# COLUMNAR DATA CACHE
 # =============================================================================
-@st.cache_data
-def load_data():
-    """Load all datasets with error handling"""
-    data = {}
-    
-    # Data path - can be customized via Streamlit secrets
-    data_path = "data/"
+def _file_sha256(path):
+    """Content hash of a source file, read in 1 MB chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _cache_is_fresh(src, meta, read_key):
+    """Check a cache entry against the source file's size, mtime and content hash"""
+    if meta.get('format') != CACHE_FORMAT_VERSION or meta.get('read_key') != read_key:
+        return False
+    if meta.get('store', 'parquet') != CACHE_STORE:
+        return False
+    stat = os.stat(src)
+    if stat.st_size != meta.get('size'):
+        return False
+    if stat.st_mtime_ns == meta.get('mtime_ns'):
+        return True
+    # Same size but touched - only the content hash can tell if it really changed
+    return _file_sha256(src) == meta.get('sha256')
+
+def _write_meta(meta_file, meta):
+    """Atomically replace a cache sidecar file"""
+    tmp_file = f"{meta_file}.{os.getpid()}.tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp_file, meta_file)
+
+def _write_cache(df, path):
+    """Write a frame to a cache file of the configured CACHE_STORE type"""
+    if CACHE_STORE == 'arrow':
+        import pyarrow as pa
+        table = pa.Table.from_pandas(df)
+        with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    else:
+        df.to_parquet(path)
+
+def _read_cache(path):
+    """Read a cache file written by _write_cache
+
+    Arrow files are memory-mapped and converted without copying wherever the
+    column type allows, so the frame's buffers are the OS page cache pages
+    shared by every process mapping the same file.
+    """
+    if CACHE_STORE == 'arrow':
+        import pyarrow as pa
+        table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+        return table.to_pandas(split_blocks=True)
+    return pd.read_parquet(path)
+
+def _float32_is_lossless(values):
+    """True if a float column survives float32 at the precision it is recorded with"""
+    values = values.to_numpy(dtype=np.float64)
+    narrowed = values.astype(np.float32).astype(np.float64)
+    for decimals in range(7):
+        if np.array_equal(np.round(values, decimals), values, equal_nan=True):
+            return np.array_equal(np.round(narrowed, decimals), values, equal_nan=True)
+    return False
+
+def compact_frame(df, categories):
+    """Store low-cardinality strings as categoricals and downcast measures
+
+    Integers go to int32 when their range fits, floats to float32 when no
+    recorded digit is lost. Returns the new frame and its (before, after)
+    memory footprint in bytes.
+    """
+    before = int(df.memory_usage(deep=True).sum())
+    df = df.copy()
+    for col in categories:
+        df[col] = df[col].astype('category')
+    info32 = np.iinfo(np.int32)
+    for col in df.select_dtypes(include='integer').columns:
+        if df[col].dtype.itemsize > 4 and df[col].between(info32.min, info32.max).all():
+            df[col] = df[col].astype(np.int32)
+    for col in df.select_dtypes(include='float64').columns:
+        if _float32_is_lossless(df[col]):
+            df[col] = df[col].astype(np.float32)
+    return df, (before, int(df.memory_usage(deep=True).sum()))
+
+def read_csv_cached(filename, categories=None, **read_kwargs):
+    """Read a CSV from DATA_DIR, going through a columnar copy in DATA_DIR/.cache/
+
+    The copy (Parquet, or Arrow IPC with NOVAMART_CACHE_STORE=arrow) is rebuilt
+    whenever the CSV's size, mtime or content hash (or the read options)
+    change. If the cache cannot be used (pyarrow missing, read-only
+    filesystem) the CSV is parsed directly. When ``categories`` is given the
+    frame is stored compacted (see compact_frame) and its memory footprint
+    before/after is kept in ``df.attrs['footprint']``.
+    """
+    src = os.path.join(DATA_DIR, filename)
+    stem = os.path.splitext(filename)[0]
+    cache_file = os.path.join(CACHE_DIR, f"{stem}.{CACHE_STORE}")
+    meta_file = os.path.join(CACHE_DIR, f"{stem}.json")
+    read_key = repr((categories, sorted(read_kwargs.items())))
     
     try:
-        # Load all CSV files
-        data['campaigns'] = pd.read_csv(f"{data_path}campaign_performance.csv", parse_dates=['date'])
-        data['customers'] = pd.read_csv(f"{data_path}customer_data.csv")
-        data['products'] = pd.read_csv(f"{data_path}product_sales.csv")
-        data['leads'] = pd.read_csv(f"{data_path}lead_scoring_results.csv")
-        data['feature_importance'] = pd.read_csv(f"{data_path}feature_importance.csv")
-        data['learning_curve'] = pd.read_csv(f"{data_path}learning_curve.csv")
-        data['geographic'] = pd.read_csv(f"{data_path}geographic_data.csv")
-        data['attribution'] = pd.read_csv(f"{data_path}channel_attribution.csv")
-        data['funnel'] = pd.read_csv(f"{data_path}funnel_data.csv")
-        data['journey'] = pd.read_csv(f"{data_path}customer_journey.csv")
-        data['correlation'] = pd.read_csv(f"{data_path}correlation_matrix.csv", index_col=0)
-        
-        return data
+        with open(meta_file) as f:
+            meta = json.load(f)
+        if os.path.exists(cache_file) and _cache_is_fresh(src, meta, read_key):
+            df = _read_cache(cache_file)
+            if meta.get('footprint'):
+                df.attrs['footprint'] = tuple(meta['footprint'])
+            if os.stat(src).st_mtime_ns != meta['mtime_ns']:
+                meta['mtime_ns'] = os.stat(src).st_mtime_ns
+                _write_meta(meta_file, meta)
+            return df
+    except (OSError, ValueError, ImportError):
+        pass
+    
+    df = pd.read_csv(src, **read_kwargs)
+    footprint = None
+    if categories is not None:
+        df, footprint = compact_frame(df, categories)
+        # The schema already types columns while parsing: compare with what a plain read_csv holds
+        plain = pd.read_csv(src, usecols=read_kwargs.get('usecols'))
+        footprint = (int(plain.memory_usage(deep=True).sum()), footprint[1])
+        del plain
+        df.attrs['footprint'] = footprint
+        logger.info("Compacted %s: %.2f MB -> %.2f MB", filename, footprint[0] / 1e6, footprint[1] / 1e6)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        stat = os.stat(src)
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        _write_cache(df, tmp_file)
+        os.replace(tmp_file, cache_file)
+        _write_meta(meta_file, {
+            'format': CACHE_FORMAT_VERSION,
+            'store': CACHE_STORE,
+            'read_key': read_key,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': _file_sha256(src),
+            'footprint': footprint,
+        })
+        if CACHE_STORE == 'arrow':
+            # Serve the mapped file rather than this process's private copy
+            df = _read_cache(cache_file)
+            df.attrs['footprint'] = footprint
+    except (OSError, ValueError, ImportError) as e:
+        logger.warning("Columnar cache disabled for %s: %s", filename, e)
+    return df
+
+# =============================================================================
+# DATA LOADING (lazy, with caching)
+# =============================================================================
+# Dataset registry: name -> CSV file in DATA_DIR and its schema. 'columns' lists
+# the columns read (in file order) with their dtype; 'category' columns are parsed
+# straight into categoricals and 'datetime' columns with DATE_FORMAT. 'compact'
+# tables are also downcast (see compact_frame); 'incremental' datasets are
+# append-only files served by CampaignStore.
+DATE_FORMAT = '%Y-%m-%d'
+
+DATASETS = {
+    'campaigns': {
+        'file': "campaign_performance.csv",
+        'columns': {
+            'date': 'datetime', 'campaign_id': 'category', 'campaign_type': 'category',
+            'channel': 'category', 'region': 'category', 'impressions': 'int32', 'clicks': 'int32',
+            'conversions': 'int32', 'spend': 'float64', 'revenue': 'float64', 'quarter': 'category',
+            'roas': 'float64',
+        },
+        'compact': True,
+        'incremental': True,
+    },
+    'customers': {
+        'file': "customer_data.csv",
+        'columns': {
+            'customer_id': 'str', 'gender': 'category', 'age': 'int32', 'age_group': 'category',
+            'income': 'int32', 'income_bracket': 'category', 'region': 'category',
+            'city_tier': 'category', 'customer_segment': 'category', 'acquisition_channel': 'category',
+            'tenure_months': 'int32', 'lifetime_value': 'int32', 'total_purchases': 'int32',
+            'avg_order_value': 'float64', 'last_purchase_days': 'int32', 'email_open_rate': 'float64',
+            'website_visits_monthly': 'int32', 'app_sessions_monthly': 'int32',
+            'support_tickets': 'int32', 'satisfaction_score': 'float64', 'nps_category': 'category',
+            'is_churned': 'int8', 'churn_probability': 'float64',
+        },
+        'compact': True,
+    },
+    'products': {
+        'file': "product_sales.csv",
+        'columns': {
+            'product_id': 'str', 'product_name': 'category', 'category': 'category',
+            'subcategory': 'category', 'region': 'category', 'quarter': 'category', 'year': 'int32',
+            'sales': 'float64', 'units_sold': 'int32', 'profit': 'float64', 'profit_margin': 'float64',
+            'return_rate': 'float64', 'avg_rating': 'float64', 'review_count': 'int32',
+        },
+        'compact': True,
+    },
+    'leads': {
+        'file': "lead_scoring_results.csv",
+        'columns': {'lead_id': 'str', 'actual_converted': 'int8', 'predicted_probability': 'float64'},
+    },
+    'feature_importance': {
+        'file': "feature_importance.csv",
+        'columns': {'feature': 'str', 'importance': 'float64', 'importance_std': 'float64'},
+    },
+    'learning_curve': {
+        'file': "learning_curve.csv",
+        'columns': {
+            'training_size': 'int32', 'train_score': 'float64', 'validation_score': 'float64',
+            'train_score_std': 'float64', 'validation_score_std': 'float64',
+        },
+    },
+    'geographic': {
+        'file': "geographic_data.csv",
+        'columns': {
+            'state': 'str', 'region': 'str', 'latitude': 'float64', 'longitude': 'float64',
+            'total_customers': 'int64', 'total_revenue': 'int64', 'revenue_per_customer': 'float64',
+            'store_count': 'int32', 'market_penetration': 'float64', 'yoy_growth': 'float64',
+            'customer_satisfaction': 'float64', 'avg_delivery_days': 'float64',
+        },
+    },
+    'funnel': {
+        'file': "funnel_data.csv",
+        'columns': {'stage': 'str', 'visitors': 'int64', 'conversion_rate': 'float64'},
+    },
+    'journey': {
+        'file': "customer_journey.csv",
+        'columns': {
+            'touchpoint_1': 'category', 'touchpoint_2': 'category', 'touchpoint_3': 'category',
+            'touchpoint_4': 'category', 'customer_count': 'int64',
+        },
+    },
+    'correlation': {'file': "correlation_matrix.csv", 'read': {'index_col': 0}},
+}
+
+# Datasets read concurrently when a page declares several of them
+LOAD_WORKERS = 4
+
+def read_options(spec):
+    """read_csv keyword arguments for a dataset's schema"""
+    options = dict(spec.get('read', {}))
+    columns = spec.get('columns')
+    if columns:
+        dates = [col for col, dtype in columns.items() if dtype == 'datetime']
+        options['usecols'] = list(columns)
+        options['dtype'] = {col: dtype for col, dtype in columns.items() if dtype != 'datetime'}
+        if dates:
+            options.update(parse_dates=dates, date_format=DATE_FORMAT)
+    return options
+
+def compact_categories(spec):
+    """Columns a compacted dataset stores as categoricals (None when it is not compacted)"""
+    if not spec.get('compact'):
+        return None
+    return [col for col, dtype in spec['columns'].items() if dtype == 'category']
+
+def read_dataset(name):
+    """Read a dataset through the columnar cache according to its schema"""
+    spec = DATASETS[name]
+    return read_csv_cached(spec['file'], categories=compact_categories(spec), **read_options(spec))
+
+def dataset_version(name):
+    """Cheap change token for a dataset (source file size and mtime)"""
+    stat = os.stat(os.path.join(DATA_DIR, DATASETS[name]['file']))
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+@st.cache_resource(show_spinner=False, max_entries=2 * len(DATASETS))
+def load_table(name, version):
+    """Load a single dataset; one shared copy per (name, version) for all sessions"""
+    return read_dataset(name)
+
+def shared_view(df):
+    """Read-only view of a shared frame for one script run
+
+    The shallow copy shares every column with the cached frame; under
+    copy-on-write, writes to the view (new columns, in-place edits, sorts)
+    copy what they touch instead of changing the frame other sessions see.
+    """
+    return df.copy(deep=False)
+
+@contextmanager
+def stop_on_data_error():
+    """Report a dataset that cannot be loaded and stop the script run"""
+    try:
+        yield
     except FileNotFoundError as e:
         st.error(f"❌ Data file not found: {e}")
-        st.info("📁 Please ensure all CSV files are in the 'data/' folder")
+        st.info(f"📁 Please ensure all CSV files are in the '{DATA_DIR}/' folder")
         st.stop()
     except Exception as e:
         st.error(f"❌ Error loading data: {e}")
         st.stop()
 
+def _load_dataset(name):
+    """Current frame of a dataset (safe to call from loader threads)"""
+    if DATASETS[name].get('incremental'):
+        return campaign_store(os.path.join(DATA_DIR, DATASETS[name]['file'])).refresh().frame
+    return load_table(name, dataset_version(name))
+
+class LazyData(Mapping):
+    """Read-only mapping of dataset name -> DataFrame that loads tables on first access"""
+    
+    def __init__(self, tables):
+        self.tables = tuple(tables)
+        self._frames = {}
+    
+    def __getitem__(self, name):
+        if name not in self.tables:
+            raise KeyError(f"Dataset '{name}' is not declared for this page")
+        if name not in self._frames:
+            with stop_on_data_error(), PROFILER.span('load', name):
+                self._frames[name] = shared_view(_load_dataset(name))
+        return self._frames[name]
+    
+    def prefetch(self):
+        """Load every declared dataset not loaded yet, reading the files concurrently
+
+        Incremental datasets are skipped: pages read them through their
+        snapshot, and their raw frame is only concatenated on access.
+        """
+        pending = [name for name in self.tables if name not in self._frames and not DATASETS[name].get('incremental')]
+        if warehouse_enabled():
+            pending = [name for name in pending if name not in WAREHOUSE_TABLES]
+        if len(pending) < 2:
+            return
+        with stop_on_data_error(), PROFILER.span('load', 'prefetch'):
+            with ThreadPoolExecutor(max_workers=min(len(pending), LOAD_WORKERS)) as pool:
+                futures = {name: pool.submit(_load_dataset, name) for name in pending}
+                for name, future in futures.items():
+                    self._frames[name] = shared_view(future.result())
+    
+    @property
+    def loaded(self):
+        """Datasets loaded so far, by name"""
+        return dict(self._frames)
+    
+    def __iter__(self):
+        return iter(self.tables)
+    
+    def __len__(self):
+        return len(self.tables)
+
+def load_data(tables=tuple(DATASETS)):
+    """Return a lazy view over the requested datasets"""
+    return LazyData(tables)
+
+# =============================================================================
+# DERIVED DATA (built once per dataset version)
+# =============================================================================
+ROLLUP_KEYS = ['date', 'channel', 'region', 'campaign_type', 'quarter']
+# roas_sum / roas_count: sum and number of the positive per-row ROAS values
+ROLLUP_MEASURES = ['impressions', 'clicks', 'conversions', 'spend', 'revenue', 'roas_sum', 'roas_count']
+
+def build_rollup(campaigns):
+    """Daily campaign cube keyed by date × channel × region × campaign_type
+
+    Holds only additive measures (summed at full precision) so every campaign
+    chart and KPI can be answered from it; ratios such as ROAS are derived from
+    the sums. ``quarter`` is carried along since it is a function of the date.
+    Rows come out sorted by date. Accepts raw campaign rows or rollup rows.
+    """
+    if 'roas_count' not in campaigns.columns:
+        positive = campaigns['roas'] > 0
+        campaigns = campaigns.assign(roas_sum=campaigns['roas'].where(positive, 0), roas_count=positive.astype(np.int64))
+    measures = campaigns[ROLLUP_MEASURES]
+    measures = measures.astype({c: np.float64 if measures[c].dtype.kind == 'f' else np.int64 for c in ROLLUP_MEASURES})
+    cube = (pd.concat([campaigns[ROLLUP_KEYS], measures], axis=1)
+            .groupby(ROLLUP_KEYS, observed=True)[ROLLUP_MEASURES]
+            .sum()
+            .reset_index())
+    return cube
+
+def merge_rollup(cube, campaigns):
+    """Fold new campaign rows into a rollup, regrouping only the days they touch onwards
+
+    Returns the new rollup and the position of its first row that changed;
+    the rows before it are those of ``cube``.
+    """
+    new = build_rollup(campaigns)
+    split = int(np.searchsorted(cube['date'].to_numpy(), new['date'].min().to_datetime64(), side='left'))
+    merged = build_rollup(pd.concat([cube.iloc[split:], new], ignore_index=True))
+    return pd.concat([cube.iloc[:split], merged], ignore_index=True), split
+
+def rollup_by_period(cube, freq, measure, by=()):
+    """Sum a rollup measure per period ('D', 'W' or 'M', labelled by period end) and dimensions"""
+    period = cube['date'].dt.to_period(freq).dt.end_time.dt.normalize()
+    keys = [period] + [cube[col] for col in by]
+    return cube.groupby(keys, observed=True)[measure].sum().reset_index()
+
+# =============================================================================
+# INCREMENTAL CAMPAIGN INGEST
+# =============================================================================
+class CampaignSnapshot:
+    """Immutable state of the campaign table at one file version
+
+    The raw rows are kept as the chunks they were ingested in and only
+    concatenated if a page asks for ``frame``; the rollup is maintained
+    alongside so most pages never need the raw rows. Snapshots
+    aggregated by DuckDB (see warehouse_snapshot) carry no raw rows at all.
+    
+    Indexes over the rollup (CampaignIndex, PrefixIndex) are built on first
+    use. A snapshot made by an append extends its predecessor's indexes past
+    the first rollup row the append changed instead of indexing the history
+    again.
+    """
+    
+    def __init__(self, version, chunks, rollup, base=None):
+        self.version = version
+        self.chunks = chunks
+        self.rollup = rollup
+        self.watermark = rollup['date'].max()
+        self._frame = None
+        self._indexes = {}
+        # Index type -> (an earlier snapshot's index, first rollup row changed since)
+        self._base = base or {}
+        self._lock = threading.Lock()
+    
+    def successor(self, version, chunks, rollup, split):
+        """The snapshot after an append that changed the rollup from row ``split`` on"""
+        base = {kind: (index, split) for kind, index in self._indexes.items()}
+        for kind, (index, since) in self._base.items():
+            base.setdefault(kind, (index, min(since, split)))
+        return CampaignSnapshot(version, chunks, rollup, base)
+    
+    def index(self, kind):
+        """The rollup's index of a type (CampaignIndex or PrefixIndex), built or extended once"""
+        with self._lock:
+            if kind not in self._indexes:
+                if kind in self._base:
+                    previous, split = self._base.pop(kind)
+                    self._indexes[kind] = previous.extended(self.rollup, split)
+                else:
+                    self._indexes[kind] = kind(self.rollup)
+            return self._indexes[kind]
+    
+    @property
+    def frame(self):
+        if self._frame is None:
+            self._frame = self.chunks[0] if len(self.chunks) == 1 else pd.concat(self.chunks, ignore_index=True)
+        return self._frame
+
+class CampaignStore:
+    """Append-aware loader for campaign_performance.csv, shared by all sessions
+
+    The file is treated as append-only: when it has grown and the bytes already
+    ingested are unchanged (checked on the header and the bytes just before the
+    ingest offset), only the complete lines past the offset are parsed and
+    folded into the rollup and its indexes. A last line the writer has not finished
+    is left for a later call. Anything else, including appended bytes that do
+    not parse, triggers a full reload.
+    """
+    
+    CHECK_BYTES = 4096
+    
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.snapshot = None
+        self.offset = 0
+        self.checkpoint = None
+    
+    def _checkpoint(self, offset):
+        with open(self.path, 'rb') as f:
+            head = f.read(self.CHECK_BYTES)
+            f.seek(max(0, offset - self.CHECK_BYTES))
+            tail = f.read(min(offset, self.CHECK_BYTES))
+        return hashlib.sha256(head + tail).hexdigest()
+    
+    def refresh(self):
+        """Current snapshot, ingesting whatever changed in the file since the last call"""
+        version = dataset_version('campaigns')
+        if self.snapshot is not None and self.snapshot.version == version:
+            return self.snapshot
+        with self.lock:
+            if self.snapshot is None or self.snapshot.version != version:
+                size = os.stat(self.path).st_size
+                if self.snapshot is not None and size > self.offset and self._checkpoint(self.offset) == self.checkpoint:
+                    self._append(version)
+                else:
+                    self._reload(version)
+            return self.snapshot
+    
+    def _reload(self, version):
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        # A writer may be partway through the last row: ingest complete lines only
+        end = data.rfind(b'\n') + 1
+        frame = read_dataset('campaigns') if end == len(data) else None
+        if frame is None or os.stat(self.path).st_size != len(data):
+            spec = DATASETS['campaigns']
+            frame = pd.read_csv(io.BytesIO(data[:end]), **read_options(spec))
+            categories = compact_categories(spec)
+            if categories is not None:
+                frame, _ = compact_frame(frame, categories)
+        self.offset, self.checkpoint = end, self._checkpoint(end)
+        self.snapshot = CampaignSnapshot(version, [frame], build_rollup(frame))
+    
+    def _append(self, version):
+        snapshot = self.snapshot
+        with open(self.path, 'rb') as f:
+            header = f.readline()
+            f.seek(self.offset)
+            tail = f.read()
+        end = tail.rfind(b'\n') + 1
+        if end == 0:
+            # Only a partial line so far; wait for the writer to finish it
+            self.snapshot = snapshot.successor(version, snapshot.chunks, snapshot.rollup, len(snapshot.rollup))
+            return
+        
+        base = snapshot.chunks[0]
+        try:
+            rows = pd.read_csv(io.BytesIO(header + tail[:end]), **read_options(DATASETS['campaigns']))
+        except (ValueError, pd.errors.ParserError) as e:
+            logger.warning("Could not parse appended campaign rows (%s); reloading", e)
+            self._reload(version)
+            return
+        for col, dtype in base.dtypes.items():
+            if isinstance(dtype, pd.CategoricalDtype) and not rows[col].dropna().isin(dtype.categories).all():
+                # A new channel/region/etc. changes every categorical code - start over
+                logger.info("New %s value in appended campaign rows; reloading", col)
+                self._reload(version)
+                return
+            rows[col] = rows[col].astype(dtype)
+        
+        rollup, split = merge_rollup(snapshot.rollup, rows)
+        self.snapshot = snapshot.successor(version, snapshot.chunks + [rows], rollup, split)
+        self.offset += end
+        self.checkpoint = self._checkpoint(self.offset)
+        logger.info("Appended %d campaign rows (watermark %s -> %s)",
+                    len(rows), snapshot.watermark.date(), self.snapshot.watermark.date())
+
+@st.cache_resource(show_spinner=False)
+def campaign_store(path):
+    """The process-wide CampaignStore for a campaign file"""
+    return CampaignStore(path)
+
+def campaign_snapshot():
+    """Up-to-date campaign snapshot (raw rows and daily rollup)"""
+    with stop_on_data_error(), PROFILER.span('load', 'campaigns'):
+        return campaign_store(os.path.join(DATA_DIR, DATASETS['campaigns']['file'])).refresh()
+
+class CampaignIndex:
+    """Filter index over the (date-sorted) campaign rollup
+
+    Rows are located by binary search on the date column; channel and region
+    selections are resolved with per-value packed row bitmaps, intersected only
+    over the bytes covering the date slice.
+    """
+    
+    def __init__(self, cube, columns=('channel', 'region')):
+        self.categories = {col: cube[col].cat.categories for col in columns}
+        self.dates = cube['date'].to_numpy()[:0]
+        self.bitmaps = {col: {} for col in columns}
+        self._index_from(cube, 0)
+    
+    def _index_from(self, cube, kept):
+        """Index the rollup rows from bitmap byte ``kept`` on, keeping the bytes before it"""
+        self.dates = np.concatenate([self.dates[:kept * 8], cube['date'].to_numpy()[kept * 8:]])
+        for col, categories in self.categories.items():
+            codes = cube[col].cat.codes.to_numpy()[kept * 8:]
+            bitmaps = {}
+            for code, value in enumerate(categories):
+                head = self.bitmaps[col].get(value)
+                head = np.zeros(kept, dtype=np.uint8) if head is None else head[:kept]
+                rows = codes == code
+                if rows.any() or head.any():
+                    bitmaps[value] = np.concatenate([head, np.packbits(rows)])
+            self.bitmaps[col] = bitmaps
+    
+    def extended(self, cube, start):
+        """The index of a rollup that kept this one's rows before position ``start``"""
+        if start > len(self.dates) or any(not cube[col].cat.categories.equals(c) for col, c in self.categories.items()):
+            return CampaignIndex(cube, tuple(self.categories))
+        index = copy.copy(self)
+        index.bitmaps = dict(self.bitmaps)
+        index._index_from(cube, start // 8)
+        return index
+    
+    def _selection(self, col, values, byte_lo, byte_hi):
+        """OR of the selected values' bitmaps over a byte range (None if nothing is excluded)"""
+        bitmaps = self.bitmaps[col]
+        if set(values) >= set(bitmaps):
+            return None
+        bits = np.zeros(byte_hi - byte_lo, dtype=np.uint8)
+        for value in values:
+            if value in bitmaps:
+                np.bitwise_or(bits, bitmaps[value][byte_lo:byte_hi], out=bits)
+        return bits
+    
+    def positions(self, start, end, **selections):
+        """Row positions with start <= date <= end matching every column selection"""
+        lo = np.searchsorted(self.dates, np.datetime64(pd.Timestamp(start)), side='left')
+        hi = np.searchsorted(self.dates, np.datetime64(pd.Timestamp(end)), side='right')
+        if lo >= hi:
+            return np.empty(0, dtype=np.intp)
+        byte_lo, byte_hi = lo // 8, (hi + 7) // 8
+        mask = None
+        for col, values in selections.items():
+            bits = self._selection(col, values, byte_lo, byte_hi)
+            if bits is not None:
+                mask = bits if mask is None else np.bitwise_and(mask, bits, out=mask)
+        if mask is None:
+            return np.arange(lo, hi)
+        rows = np.flatnonzero(np.unpackbits(mask)) + byte_lo * 8
+        return rows[(rows >= lo) & (rows < hi)]
+
+class PrefixIndex:
+    """Per-day cumulative sums of the rollup measures, overall and per channel
+
+    Totals over any date range are the difference of two rows of the running
+    sums, so a period's KPIs and those of the period it is compared with cost
+    O(1) however long the history is.
+    """
+    
+    def __init__(self, cube, by='channel'):
+        self.by = by
+        self.first = cube['date'].min()
+        self.groups = {value: i + 1 for i, value in enumerate(cube[by].cat.categories)}
+        # Row 0 holds the overall sums; a leading zero day makes every range a plain difference
+        self.days, self.rows = 0, 0
+        self.cumulative = np.zeros((len(self.groups) + 1, 1, len(ROLLUP_MEASURES)))
+        self._index_from(cube, 0)
+    
+    def _index_from(self, cube, start):
+        """Recompute the running sums from the day of rollup row ``start`` on"""
+        tail = cube.iloc[start:]
+        days = (tail['date'] - self.first).dt.days.to_numpy()
+        if len(days):
+            since, self.days = int(days.min()), int(days.max()) + 1
+            if since >= self.cumulative.shape[1]:
+                # Days without rows between the old history and the new rows
+                gap = np.repeat(self.cumulative[:, -1:], since + 1 - self.cumulative.shape[1], axis=1)
+                self.cumulative = np.concatenate([self.cumulative, gap], axis=1)
+            sums = np.zeros((len(self.groups) + 1, self.days - since, len(ROLLUP_MEASURES)))
+            np.add.at(sums, (tail[self.by].cat.codes.to_numpy() + 1, days - since), tail[ROLLUP_MEASURES].to_numpy(np.float64))
+            sums[0] = sums[1:].sum(axis=0)
+            running = self.cumulative[:, since:since + 1] + sums.cumsum(axis=1)
+            self.cumulative = np.concatenate([self.cumulative[:, :since + 1], running], axis=1)
+        self.rows = len(cube)
+        self.last = self.first + pd.Timedelta(days=self.days - 1)
+    
+    def extended(self, cube, start):
+        """The index of a rollup that kept this one's rows before position ``start``"""
+        groups = {value: i + 1 for i, value in enumerate(cube[self.by].cat.categories)}
+        if not 0 < start <= self.rows or groups != self.groups:
+            return PrefixIndex(cube, self.by)
+        index = copy.copy(self)
+        index._index_from(cube, start)
+        return index
+    
+    def covers(self, start, end):
+        """True if every day of start..end lies within the indexed history"""
+        return self.first <= pd.Timestamp(start) and pd.Timestamp(end) <= self.last
+    
+    def totals(self, start, end, group=None):
+        """Measure sums for start <= date <= end (clipped to the history), overall or for one group"""
+        lo = min(max((pd.Timestamp(start) - self.first).days, 0), self.days)
+        hi = min(max((pd.Timestamp(end) - self.first).days + 1, lo), self.days)
+        running = self.cumulative[self.groups[group] if group is not None else 0]
+        return dict(zip(ROLLUP_MEASURES, running[hi] - running[lo]))
+
+def comparison_window(start, end, comparison):
+    """The window a period is compared with: the same number of days before it, or a year earlier"""
+    start, end = pd.Timestamp(start), pd.Timestamp(end)
+    if comparison == "Same period last year":
+        offset = pd.DateOffset(years=1)
+    else:
+        offset = pd.Timedelta(days=(end - start).days + 1)
+    return start - offset, end - offset
+
+def change(current, previous):
+    """Relative change as a metric delta string, or None without a comparable value"""
+    if previous is None or not previous:
+        return None
+    return f"{current / previous - 1:+.1%}"
+
+class ThresholdTable:
+    """Confusion counts for every classification threshold from one sort of the scores
+
+    Leads are sorted by predicted probability once; suffix sums of positives and
+    negatives then give TP/FP for "score >= threshold" via a binary search.
+    """
+    
+    def __init__(self, y_true, scores):
+        order = np.argsort(scores, kind='mergesort')
+        self.scores = np.asarray(scores, dtype=np.float64)[order]
+        positive = np.asarray(y_true)[order].astype(bool)
+        # Element i counts rows at sorted positions >= i; the trailing 0 is "above every score"
+        self.pos_above = np.append(np.cumsum(positive[::-1])[::-1], 0)
+        self.neg_above = np.append(np.cumsum(~positive[::-1])[::-1], 0)
+    
+    def metrics(self, thresholds):
+        """Confusion counts and accuracy/precision/recall/F1 for each threshold"""
+        thresholds = np.atleast_1d(np.asarray(thresholds, dtype=np.float64))
+        i = np.searchsorted(self.scores, thresholds, side='left')
+        tp, fp = self.pos_above[i], self.neg_above[i]
+        fn, tn = self.pos_above[0] - tp, self.neg_above[0] - fp
+        with np.errstate(divide='ignore', invalid='ignore'):
+            precision = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+            recall = np.where(tp + fn > 0, tp / (tp + fn), 0.0)
+            f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+        return pd.DataFrame({
+            'threshold': thresholds,
+            'tn': tn, 'fp': fp, 'fn': fn, 'tp': tp,
+            'accuracy': (tp + tn) / len(self.scores),
+            'precision': precision,
+            'recall': recall,
+            'f1': f1,
+        })
+
+@st.cache_resource(show_spinner=False)
+def threshold_table(version):
+    """ThresholdTable for the leads dataset at this version"""
+    leads = load_table('leads', version)
+    return ThresholdTable(leads['actual_converted'].to_numpy(), leads['predicted_probability'].to_numpy())
+
+CURVE_MAX_POINTS = 400
+
+def decimate_curve(x, y, max_points=CURVE_MAX_POINTS):
+    """Thin a curve to at most max_points vertices spaced evenly along its length"""
+    if len(x) <= max_points:
+        return x, y
+    length = np.concatenate([[0.0], np.cumsum(np.hypot(np.diff(x), np.diff(y)))])
+    keep = np.searchsorted(length, np.linspace(0, length[-1], max_points))
+    keep = np.unique(np.concatenate([[0], np.minimum(keep, len(x) - 1), [len(x) - 1]]))
+    return x[keep], y[keep]
+
+@st.cache_data(show_spinner=False)
+def model_curves(version):
+    """ROC AUC plus decimated ROC and precision-recall curves for the leads dataset"""
+    from sklearn.metrics import roc_curve, auc, precision_recall_curve
+    leads = load_table('leads', version)
+    y_true, scores = leads['actual_converted'], leads['predicted_probability']
+    fpr, tpr, _ = roc_curve(y_true, scores)
+    precision, recall, _ = precision_recall_curve(y_true, scores)
+    curves = {'auc': auc(fpr, tpr)}
+    curves['fpr'], curves['tpr'] = decimate_curve(fpr, tpr)
+    curves['recall'], curves['precision'] = decimate_curve(recall, precision)
+    return curves
+
+SCATTER_POINT_LIMIT = 20_000
+SCATTER_BINS = 80
+
+@st.cache_data(show_spinner=False)
+def customer_trend(version):
+    """Least-squares fit of lifetime value on income over all customers: (slope, intercept, R²)"""
+    from scipy import stats
+    customers = load_table('customers', version)
+    valid = customers.dropna(subset=['income', 'lifetime_value'])
+    fit = stats.linregress(valid['income'].astype(np.float64), valid['lifetime_value'].astype(np.float64))
+    return fit.slope, fit.intercept, fit.rvalue ** 2
+
+# Bounded: every zoom position is a new key
+@st.cache_data(show_spinner=False, max_entries=32)
+def income_ltv_density(version, income_range, ltv_range, bins=SCATTER_BINS):
+    """2D histogram of customers over income × lifetime value within the given ranges"""
+    customers = load_table('customers', version)
+    counts, x_edges, y_edges = np.histogram2d(
+        customers['income'], customers['lifetime_value'],
+        bins=bins, range=[income_range, ltv_range]
+    )
+    return counts, x_edges, y_edges
+
+BOX_MAX_OUTLIERS = 200
+KDE_GRID_POINTS = 200
+
+def box_stats(values):
+    """Tukey box statistics: quartiles, 1.5×IQR whiskers and up to BOX_MAX_OUTLIERS distinct outliers"""
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    q1, median, q3 = np.quantile(values, [0.25, 0.5, 0.75])
+    low, high = q1 - 1.5 * (q3 - q1), q3 + 1.5 * (q3 - q1)
+    inside = values[(values >= low) & (values <= high)]
+    outliers = np.unique(values[(values < low) | (values > high)])
+    if len(outliers) > BOX_MAX_OUTLIERS:
+        outliers = outliers[np.linspace(0, len(outliers) - 1, BOX_MAX_OUTLIERS).astype(int)]
+    return {
+        'q1': q1, 'median': median, 'q3': q3,
+        'lowerfence': inside.min(), 'upperfence': inside.max(),
+        'outliers': outliers,
+    }
+
+def kde_curve(values, grid_points=KDE_GRID_POINTS):
+    """Gaussian KDE (Silverman bandwidth) on a grid spanning the data ± 2 bandwidths
+
+    Values are first binned onto a fine grid and the kernel is applied by
+    convolution, so the cost does not grow with the number of values beyond
+    the single binning pass.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    q1, q3 = np.quantile(values, [0.25, 0.75])
+    spread = min(values.std(), (q3 - q1) / 1.34) or values.std() or 1.0
+    bandwidth = 1.06 * spread * len(values) ** -0.2
+    grid = np.linspace(values.min() - 2 * bandwidth, values.max() + 2 * bandwidth, grid_points)
+    step = grid[1] - grid[0]
+    counts, _ = np.histogram(values, bins=grid_points, range=(grid[0] - step / 2, grid[-1] + step / 2))
+    offsets = np.arange(-(grid_points - 1), grid_points) * step
+    kernel = np.exp(-0.5 * (offsets / bandwidth) ** 2)
+    density = np.convolve(counts, kernel, mode='valid') / (len(values) * bandwidth * np.sqrt(2 * np.pi))
+    return grid, density
+
+@st.cache_data(show_spinner=False)
+def age_histogram(version, bin_width):
+    """Age bin edges and counts for a bin width, plus the age box statistics"""
+    ages = load_table('customers', version)['age'].to_numpy()
+    # Past the oldest age, so it is not folded into a closed last bin: bins are [a, a + width)
+    edges = np.arange(ages.min(), ages.max() + bin_width + 1, bin_width)
+    counts, edges = np.histogram(ages, bins=edges)
+    return edges, counts, box_stats(ages)
+
+@st.cache_data(show_spinner=False)
+def grouped_distribution(version, column, by, with_kde=False):
+    """Box statistics (and optionally a KDE curve) of a customer column per group"""
+    customers = load_table('customers', version)
+    groups = {}
+    for name, values in customers.groupby(by, observed=True)[column]:
+        groups[name] = box_stats(values)
+        if with_kde:
+            groups[name]['kde'] = kde_curve(values)
+    return groups
+
+ATTRIBUTION_MODELS = ['first_touch', 'last_touch', 'linear', 'time_decay', 'position_based']
+
+# Journey steps that are outcomes or site visits rather than marketing channels
+JOURNEY_CONVERSION = 'Purchase'
+JOURNEY_NON_CHANNELS = ('Website', 'Purchase', 'Exit')
+
+# Time decay: each touch gets half the credit of the one after it
+TIME_DECAY_HALF_LIFE = 1.0
+# Position-based: the first and last touch get this share each, the touches between split the rest
+POSITION_ENDS_SHARE = 0.4
+
+def journey_paths(journey):
+    """Channel codes of each journey's touches (in order, -1 padded), the channel names and conversion weights
+
+    Steps are mapped through their categories, so the work per journey is
+    an integer lookup per step, whatever the number of distinct paths.
+    """
+    steps = sorted((col for col in journey.columns if col.startswith('touchpoint_')),
+                   key=lambda col: int(col.rsplit('_', 1)[1]))
+    columns = [journey[col].astype('category') for col in steps]
+    names = pd.Index(sorted(set().union(*(col.cat.categories.astype(str) for col in columns))))
+    channels = names.difference(JOURNEY_NON_CHANNELS)
+    codes = np.empty((len(journey), len(steps)), dtype=np.int32)
+    converted = np.zeros(len(journey), dtype=bool)
+    for j, col in enumerate(columns):
+        # Missing steps have code -1, which picks the trailing -1
+        lookup = np.append(channels.get_indexer(col.cat.categories.astype(str)), -1)
+        codes[:, j] = lookup[col.cat.codes.to_numpy()]
+        converted |= (col == JOURNEY_CONVERSION).to_numpy(dtype=bool)
+    # Move each path's touches to the front, keeping their order
+    codes = np.take_along_axis(codes, np.argsort(codes < 0, axis=1, kind='stable'), axis=1)
+    weights = np.where(converted, journey['customer_count'].to_numpy(np.float64), 0.0)
+    return codes, channels, weights
+
+def attribution_counts(codes, weights, n_channels):
+    """Conversions per (path length, touch position, channel), from the converting paths"""
+    codes, weights = codes[weights > 0], weights[weights > 0]
+    width = codes.shape[1]
+    lengths = (codes >= 0).sum(axis=1)
+    rows, positions = np.nonzero(codes >= 0)
+    index = (lengths[rows] * width + positions) * n_channels + codes[rows, positions]
+    counts = np.bincount(index, weights=weights[rows], minlength=(width + 1) * width * n_channels)
+    return counts.reshape(width + 1, width, n_channels)
+
+def position_credit(width, model):
+    """Share of a conversion each touch position gets under a model, per path length (rows: length 0..width)"""
+    length = np.arange(width + 1)[:, None]
+    position = np.arange(width)[None, :]
+    touched = position < length
+    last = length - 1
+    if model == 'first_touch':
+        credit = touched & (position == 0)
+    elif model == 'last_touch':
+        credit = position == last
+    elif model == 'linear':
+        credit = touched / np.maximum(length, 1)
+    elif model == 'time_decay':
+        credit = np.where(touched, 0.5 ** ((last - position) / TIME_DECAY_HALF_LIFE), 0.0)
+        credit = credit / np.maximum(credit.sum(axis=1, keepdims=True), 1e-300)
+    elif model == 'position_based':
+        # One or two touches split the credit evenly
+        ends = np.where(length > 2, POSITION_ENDS_SHARE, 1 / np.maximum(length, 1))
+        middle = (1 - 2 * POSITION_ENDS_SHARE) / np.maximum(length - 2, 1)
+        credit = touched * np.where((position == 0) | (position == last), ends, middle)
+    else:
+        raise ValueError(f"Unknown attribution model: {model}")
+    return credit.astype(np.float64)
+
+@st.cache_data(show_spinner=False)
+def journey_attribution(version):
+    """Percent of conversions credited to each channel under each attribution model, from the journey paths"""
+    codes, channels, weights = journey_paths(load_table('journey', version))
+    counts = attribution_counts(codes, weights, len(channels))
+    credit = pd.DataFrame(
+        {model: np.einsum('kp,kpc->c', position_credit(codes.shape[1], model), counts) for model in ATTRIBUTION_MODELS},
+        index=pd.Index(channels, name='channel')
+    )
+    credit = credit[credit.sum(axis=1) > 0]
+    return (credit / credit.sum() * 100).reset_index()
+
+# =============================================================================
+# QUERY BACKENDS (pandas in memory, or DuckDB over the files in DATA_DIR)
+# =============================================================================
+# Tables the DuckDB backend answers with queries; with that backend they are
+# only loaded into pandas by pages that need their raw rows
+WAREHOUSE_TABLES = ('campaigns', 'customers', 'products')
+TOP_PRODUCT_COLUMNS = ['product_name', 'category', 'sales', 'profit_margin', 'region']
+CUSTOMER_TABLE_COLUMNS = [
+    'customer_id', 'customer_segment', 'age', 'gender', 'region', 'city_tier', 'income',
+    'lifetime_value', 'total_purchases', 'satisfaction_score', 'nps_category', 'churn_probability',
+]
+
+# DATASETS dtype -> DuckDB column type
+DUCKDB_TYPES = {
+    'category': 'VARCHAR', 'str': 'VARCHAR', 'datetime': 'DATE',
+    'int8': 'TINYINT', 'int32': 'INTEGER', 'int64': 'BIGINT', 'float64': 'DOUBLE',
+}
+
+def product_tree(products):
+    """Sales, units and sales-weighted margin per category › subcategory › product"""
+    weighted = products['profit_margin'].astype(np.float64) * products['sales']
+    tree = (products.assign(weighted_margin=weighted)
+            .groupby(['category', 'subcategory', 'product_name'], observed=True)
+            .agg(sales=('sales', 'sum'), units_sold=('units_sold', 'sum'), weighted_margin=('weighted_margin', 'sum'))
+            .reset_index())
+    tree['profit_margin'] = tree.pop('weighted_margin') / tree['sales']
+    return tree
+
+def category_by_region(products):
+    """Sales, units and sales-weighted margin per category × region"""
+    weighted = products['profit_margin'].astype(np.float64) * products['sales']
+    totals = (products.assign(weighted_margin=weighted)
+              .groupby(['category', 'region'], observed=True)
+              .agg(sales=('sales', 'sum'), units_sold=('units_sold', 'sum'), weighted_margin=('weighted_margin', 'sum'))
+              .reset_index())
+    totals['profit_margin'] = totals.pop('weighted_margin') / totals['sales']
+    return totals
+
+# Children shown per parent in the product hierarchy charts; the rest are merged into "Other"
+HIERARCHY_TOP_N = 10
+
+HIERARCHY_HOVER = (
+    '<b>%{label}</b><br>Sales: ₹%{value:,.0f}<br>Profit margin: %{customdata[0]:.1f}%'
+    '<br>Units sold: %{customdata[1]:,.0f}<extra></extra>'
+)
+
+def hierarchy_nodes(leaves, path, top_n, color='profit_margin'):
+    """Treemap/sunburst nodes (id, parent, label, sales, units_sold, profit_margin, color) for a hierarchy
+
+    ``leaves`` has one row per leaf of ``path``. Each parent keeps its
+    ``top_n`` largest children by sales and the rest are merged into one
+    "Other (k)" leaf, so the node count depends on ``top_n``, not on the
+    catalog size. Margins and ``color`` (the sales-weighted mean of that
+    leaf column, as px.treemap colours parents) are sales-weighted at every
+    level, so parents stay within the leaves' colour range.
+    """
+    frame = leaves[path].astype(str).assign(
+        sales=leaves['sales'].to_numpy(np.float64),
+        units_sold=leaves['units_sold'].to_numpy(np.float64),
+        weighted_margin=(leaves['profit_margin'] * leaves['sales']).to_numpy(np.float64),
+        weighted_color=(leaves[color] * leaves['sales']).to_numpy(np.float64)
+    )
+    parent = pd.Series('', index=frame.index)
+    nodes = []
+    for level in path:
+        label = frame[level]
+        node_sales = frame.groupby([parent, label])['sales'].sum()
+        rank = node_sales.groupby(level=0).rank(method='first', ascending=False)
+        overflow = rank > top_n
+        overflow &= overflow.groupby(level=0).transform('sum') > 1  # a lone extra child is kept
+        merged = pd.MultiIndex.from_arrays([parent, label]).isin(overflow.index[overflow])
+        if merged.any():
+            others = overflow.groupby(level=0).sum()
+            label = label.mask(merged, 'Other (' + parent.map(others).astype(int).astype(str) + ')')
+        node_id = label.where(parent == '', parent + '/' + label)
+        level_nodes = (frame.assign(id=node_id, parent=parent, label=label)
+                       .groupby(['id', 'parent', 'label'])[['sales', 'units_sold', 'weighted_margin', 'weighted_color']].sum()
+                       .reset_index())
+        nodes.append(level_nodes)
+        # Children of a merged node are not drawn
+        frame, parent = frame[~merged], node_id[~merged]
+    nodes = pd.concat(nodes, ignore_index=True)
+    nodes['profit_margin'] = nodes.pop('weighted_margin') / nodes['sales']
+    nodes['color'] = nodes.pop('weighted_color') / nodes['sales']
+    return nodes
+
+class FrameQueries:
+    """Page aggregates computed in pandas from the loaded datasets"""
+    
+    def __init__(self, data):
+        self.data = data
+    
+    def campaigns(self):
+        return campaign_snapshot()
+    
+    def row_count(self, name):
+        return len(self.data[name])
+    
+    def product_tree(self):
+        return product_tree(self.data['products'])
+    
+    def category_by_region(self):
+        return category_by_region(self.data['products'])
+    
+    def table_page(self, name, columns, sort, ascending, search, offset, limit):
+        frame = self.data[name][columns]
+        return frame_page(frame, (name, dataset_version(name), tuple(columns)), sort, ascending, search, offset, limit)
+
+@st.cache_resource(show_spinner=False)
+def warehouse():
+    """DuckDB connection with a view per WAREHOUSE_TABLES dataset, or None if duckdb is missing"""
+    try:
+        import duckdb
+    except ImportError:
+        logger.warning("NOVAMART_BACKEND=duckdb but duckdb is not installed; using pandas")
+        return None
+    con = duckdb.connect()
+    for name in WAREHOUSE_TABLES:
+        columns = DATASETS[name]['columns']
+        path = os.path.join(DATA_DIR, DATASETS[name]['file']).replace("'", "''")
+        types = ", ".join(f"'{col}': '{DUCKDB_TYPES[dtype]}'" for col, dtype in columns.items())
+        con.execute(
+            f"CREATE VIEW {name} AS SELECT {', '.join(columns)} "
+            f"FROM read_csv('{path}', header = true, dateformat = '{DATE_FORMAT}', types = {{{types}}})"
+        )
+    return con
+
+# Bounded: table search, sort and page offsets are part of the key
+@st.cache_data(show_spinner=False, max_entries=256)
+def warehouse_query(sql, params, version):
+    """Result of a DuckDB query as a DataFrame; cached per (query, source file version)"""
+    return warehouse().cursor().execute(sql, list(params)).df()
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def warehouse_snapshot(version):
+    """Campaign snapshot (daily rollup only) aggregated by DuckDB"""
+    keys = ', '.join(ROLLUP_KEYS)
+    sums = ', '.join(
+        f"sum({m})::{'DOUBLE' if DATASETS['campaigns']['columns'][m] == 'float64' else 'BIGINT'} AS {m}"
+        for m in ROLLUP_MEASURES[:-2]
+    )
+    rollup = warehouse().cursor().execute(f"""
+        SELECT {keys}, {sums},
+               coalesce(sum(roas) FILTER (roas > 0), 0)::DOUBLE AS roas_sum,
+               count(*) FILTER (roas > 0)::BIGINT AS roas_count
+        FROM campaigns GROUP BY ALL ORDER BY {keys}""").df()
+    rollup['date'] = pd.to_datetime(rollup['date'])
+    rollup = rollup.astype({col: 'category' for col in ROLLUP_KEYS[1:]})
+    return CampaignSnapshot(version, [], rollup)
+
+class WarehouseQueries:
+    """Page aggregates pushed down to DuckDB; only the results are held in memory"""
+    
+    def campaigns(self):
+        with stop_on_data_error(), PROFILER.span('query', 'campaigns'):
+            return warehouse_snapshot(dataset_version('campaigns'))
+    
+    def _query(self, name, sql, *params):
+        with stop_on_data_error(), PROFILER.span('query', name):
+            return warehouse_query(sql, params, dataset_version(name))
+    
+    def row_count(self, name):
+        return int(self._query(name, f"SELECT count(*) AS n FROM {name}")['n'].iloc[0])
+    
+    def product_tree(self):
+        return self._query('products', """
+            SELECT category, subcategory, product_name, sum(sales) AS sales, sum(units_sold) AS units_sold,
+                   sum(profit_margin * sales) / sum(sales) AS profit_margin
+            FROM products GROUP BY ALL ORDER BY ALL""")
+    
+    def category_by_region(self):
+        return self._query('products', """
+            SELECT category, region, sum(sales) AS sales, sum(units_sold) AS units_sold,
+                   sum(profit_margin * sales) / sum(sales) AS profit_margin
+            FROM products GROUP BY ALL ORDER BY ALL""")
+    
+    def table_page(self, name, columns, sort, ascending, search, offset, limit):
+        if sort not in columns:
+            raise ValueError(f"Cannot sort {name} by {sort!r}: not one of the table's columns")
+        where, params = "", []
+        searched = [col for col in columns if DATASETS[name]['columns'][col] in ('category', 'str')]
+        if search and searched:
+            where = "WHERE " + " OR ".join(f"contains(lower({col}), ?)" for col in searched)
+            params = [search.lower()] * len(searched)
+        total = int(self._query(name, f"SELECT count(*) AS n FROM {name} {where}", *params)['n'].iloc[0])
+        rows = self._query(name, f"""
+            SELECT {', '.join(columns)} FROM {name} {where}
+            ORDER BY {sort} {'ASC' if ascending else 'DESC'} NULLS LAST, {columns[0]}
+            LIMIT ? OFFSET ?""", *params, limit, offset)
+        return rows, total
+
+def warehouse_enabled():
+    """True when the DuckDB backend is selected and available"""
+    return QUERY_BACKEND == 'duckdb' and warehouse() is not None
+
+def queries(data):
+    """Query interface of the configured backend for a page's datasets"""
+    return WarehouseQueries() if warehouse_enabled() else FrameQueries(data)
+
+# =============================================================================
+# FIGURE SLIMMING (smaller st.plotly_chart payloads)
+# =============================================================================
+# Significant digits kept in data no hover or text label shows (0 = send figures as built)
+FIGURE_DIGITS = int(os.environ.get("NOVAMART_FIGURE_DIGITS", "6"))
+
+# Hover placeholders showing a trace attribute (others are named by their path, e.g. %{lat})
+HOVER_FIELDS = {
+    ('x',): 'x', ('y',): 'y', ('z',): 'z', ('values',): 'value',
+    ('marker', 'size'): 'marker.size', ('marker', 'color'): 'marker.color', ('marker', 'colors'): 'color',
+}
+
+# Template layout sections that only apply to these trace types
+TEMPLATE_SUBPLOTS = {
+    'geo': {'scattergeo', 'choropleth'},
+    'polar': {'scatterpolar', 'scatterpolargl', 'barpolar'},
+    'ternary': {'scatterternary'},
+    'scene': {'scatter3d', 'surface', 'mesh3d'},
+}
+
+# Trace types drawing branch totals from ``values``, which must cover their children exactly
+HIERARCHY_TRACES = {'treemap', 'sunburst', 'icicle'}
+
+CUSTOMDATA_REF = re.compile(r'%\{customdata\[(\d+)\]')
+TEMPLATE_PLACEHOLDER = re.compile(r'%\{([^}:|]+)([:|][^}]*)?\}')
+# d3 formats showing a fixed number of decimals, e.g. ',.0f', '$,.2f' or '.1%'
+FIXED_DECIMALS = re.compile(r'\.(\d+)([f%])$')
+
+def round_significant(values, digits=FIGURE_DIGITS):
+    """Round a float array to a number of significant digits (NaN and inf pass through)"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        magnitude = np.floor(np.log10(np.abs(values)))
+        scale = 10.0 ** np.where(np.isfinite(magnitude), digits - 1 - magnitude, 0)
+        return np.round(values * scale) / scale
+
+def fixed_decimals(spec):
+    """Decimals a placeholder format such as ':,.0f' or ':.1%' shows, or None when it shows every digit"""
+    if not spec.startswith(':'):
+        return None
+    match = FIXED_DECIMALS.search(spec)
+    if match:
+        return int(match.group(1)) + (2 if match.group(2) == '%' else 0)
+    return 0 if spec.endswith('d') else None
+
+def template_formats(props):
+    """Placeholder formats per field of a trace's hover and text templates
+
+    None when plotly's default hover or text labels show the data, which
+    print values as they are.
+    """
+    hover, text = props.get('hovertemplate'), props.get('texttemplate')
+    if not isinstance(hover, str) or not isinstance(text, (str, type(None))):
+        return None
+    if text is None and props.get('textinfo') not in (None, 'none'):
+        return None
+    formats = {}
+    for template in filter(None, (hover, text)):
+        for field, spec in TEMPLATE_PLACEHOLDER.findall(template):
+            formats.setdefault(field, []).append(spec)
+    return formats
+
+def field_formats(path, values, formats):
+    """Formats of the placeholders showing an attribute, one list per column (customdata has several)"""
+    columns = values.shape[1] if values.ndim == 2 else 1
+    if formats is None:
+        return [['']] * columns
+    if path == ('customdata',) and values.ndim == 2:
+        return [formats.get(f'customdata[{i}]', []) for i in range(columns)]
+    return [formats.get(HOVER_FIELDS.get(path, '.'.join(path)), [])] * columns
+
+def display_rounding(values, specs):
+    """Values rounded as far as the placeholders showing them allow, and the error float32 may add
+
+    Values no placeholder shows only place marks and keep FIGURE_DIGITS
+    significant digits. Values every placeholder shows with fixed decimals
+    are rounded to those decimals. Anything else keeps every digit.
+    """
+    if not specs:
+        rounded = round_significant(values)
+        return rounded, np.abs(rounded) * 10.0 ** -FIGURE_DIGITS
+    decimals = [fixed_decimals(spec) for spec in specs]
+    if None in decimals:
+        return values, 0.0
+    return np.round(values, max(decimals)), 10.0 ** -max(decimals) / 4
+
+def compact_array(values, formats):
+    """The smallest array showing the same values, or None to send it as is
+
+    ``formats`` lists the placeholder formats showing each column (see
+    field_formats). Floats are rounded by display_rounding, then sent as
+    integers when they are whole numbers (plotly picks the narrowest type)
+    or as float32 when that moves no value past the rounding tolerance.
+    Midnight timestamps become dates.
+    """
+    if values.dtype.kind == 'f':
+        columns = values.reshape(len(values), -1)
+        rounded, tolerance = zip(*(display_rounding(columns[:, i], specs) for i, specs in enumerate(formats)))
+        rounded = np.column_stack(rounded).reshape(values.shape)
+        tolerance = np.column_stack([np.broadcast_to(t, len(values)) for t in tolerance]).reshape(values.shape)
+        finite = np.isfinite(rounded)
+        if finite.all() and (rounded == np.round(rounded)).all() and np.abs(rounded).max(initial=0) < 2**31:
+            return rounded.astype(np.int64)
+        narrow = rounded.astype(np.float32)
+        if (np.abs(narrow - rounded) <= tolerance)[finite].all():
+            return narrow
+        return None if np.array_equal(rounded, values, equal_nan=True) else rounded
+    if values.dtype.kind == 'M':
+        if np.isnat(values).any():
+            return None
+        unit = 'D' if (values == values.astype('datetime64[D]')).all() else 's'
+        return np.datetime_as_string(values, unit=unit)
+    return None
+
+def compact_props(props, formats, exact=(), path=()):
+    """Compacted data arrays of a trace's properties, nested like the properties
+
+    Top-level properties named in ``exact`` keep every value as built.
+    """
+    updates = {}
+    for key, value in props.items():
+        if isinstance(value, dict):
+            nested = compact_props(value, formats, path=path + (key,))
+            if nested:
+                updates[key] = nested
+        elif isinstance(value, np.ndarray) and value.size:
+            columns = field_formats(path + (key,), value, None if key in exact and not path else formats)
+            compact = compact_array(value, columns)
+            if compact is not None:
+                updates[key] = compact
+    return updates
+
+def branch_totals_hold(props):
+    """Whether every branch of a ``branchvalues='total'`` hierarchy is at least the sum of its children
+
+    plotly.js draws nothing at all for a treemap/sunburst/icicle breaking this.
+    """
+    if props.get('branchvalues') != 'total' or props.get('values') is None or props.get('parents') is None:
+        return True
+    ids = props.get('ids') if props.get('ids') is not None else props.get('labels')
+    nodes = pd.DataFrame({'id': np.asarray(ids), 'parent': np.asarray(props['parents']),
+                          'value': np.asarray(props['values'], dtype=float)})
+    children = nodes.groupby('parent')['value'].sum()
+    totals = nodes.set_index('id')['value'].reindex(children.index)
+    return bool((totals.isna() | (totals >= children * (1 - 1e-6))).all())
+
+def same_values(a, b):
+    """Element-wise equality of two columns, comparing numbers as numbers"""
+    try:
+        return np.array_equal(np.asarray(a, dtype=float), np.asarray(b, dtype=float), equal_nan=True)
+    except (TypeError, ValueError):
+        return np.array_equal(np.asarray(a, dtype=object), np.asarray(b, dtype=object))
+
+def dedupe_customdata(props):
+    """Drop customdata columns the hover text doesn't need
+
+    A column repeating a trace attribute (px puts ``hover_data`` columns used
+    for size or color there) is shown through that attribute's placeholder
+    instead; a column nothing refers to is dropped.
+    """
+    customdata = props.get('customdata')
+    templates = {key: props.get(key) for key in ('hovertemplate', 'texttemplate') if props.get(key) is not None}
+    if customdata is None or np.ndim(customdata) != 2 or not all(isinstance(t, str) for t in templates.values()):
+        return {}
+    customdata = np.asarray(customdata)
+    used = {int(i) for t in templates.values() for i in CUSTOMDATA_REF.findall(t)}
+    fields = {}
+    for path, field in HOVER_FIELDS.items():
+        value = props
+        for part in path:
+            value = value.get(part) if isinstance(value, dict) else None
+        if value is not None and np.ndim(value) == 1 and len(value) == len(customdata):
+            fields[field] = value
+    keep, placeholders = [], {}
+    for i in range(customdata.shape[1]):
+        if i not in used:
+            continue
+        field = next((f for f, v in fields.items() if same_values(customdata[:, i], v)), None)
+        placeholders[i] = field or f'customdata[{len(keep)}]'
+        if field is None:
+            keep.append(i)
+    if len(keep) == customdata.shape[1] or max(used, default=-1) >= customdata.shape[1]:
+        return {}
+    updates = {key: CUSTOMDATA_REF.sub(lambda m: '%{' + placeholders[int(m.group(1))], t) for key, t in templates.items()}
+    updates['customdata'] = customdata[:, keep] if keep else None
+    return updates
+
+def slim_template(fig):
+    """Keep only the template entries for the figure's trace types, subplots and decorations"""
+    trace_types = {trace.type for trace in fig.data}
+    template = fig.layout.template.to_plotly_json()
+    layout = {
+        key: value for key, value in template.get('layout', {}).items()
+        if trace_types & TEMPLATE_SUBPLOTS.get(key, trace_types)
+    }
+    if not fig.layout.shapes:
+        layout.pop('shapedefaults', None)
+    if not fig.layout.annotations:
+        layout.pop('annotationdefaults', None)
+    data = {key: value for key, value in template.get('data', {}).items() if key in trace_types}
+    fig.layout.template = go.layout.Template(data=data, layout=layout)
+
+def set_props(obj, updates):
+    """Assign nested property values, even ones plotly considers equal to the current ones"""
+    for key, value in updates.items():
+        if isinstance(value, dict):
+            set_props(obj[key], value)
+        else:
+            obj[key] = None  # plotly skips values equal to the current ones, whatever their dtype
+            obj[key] = value
+
+def slim_figure(fig):
+    """Shrink a figure's JSON in place: compact data arrays, no repeated hover columns, a trimmed template"""
+    if not FIGURE_DIGITS:
+        return fig
+    for trace in fig.data:
+        props = trace.to_plotly_json()
+        updates = dedupe_customdata(props)
+        props.update(updates)
+        compact = compact_props(props, template_formats(props), exact=('values',) if trace.type in HIERARCHY_TRACES else ())
+        if 'values' in compact and not branch_totals_hold({**props, 'values': compact['values']}):
+            logger.warning("Slimming broke the branch totals of a %s; sending its values as built", trace.type)
+            del compact['values']
+        updates.update(compact)
+        set_props(trace, updates)
+    slim_template(fig)
+    return fig
+
+# =============================================================================
+# INSTRUMENTATION (opt-in, per script run)
+# =============================================================================
+class Profiler:
+    """Timing spans and figure payload sizes for one script run
+
+    Spans time a block; laps time the stretch since the previous span or lap
+    ended (used for figure construction). Every method is a no-op while
+    ``enabled`` is False.
+    """
+    
+    def __init__(self, enabled=False, page=None):
+        self.enabled = enabled
+        self.page = page
+        self.records = []
+        self._mark = time.perf_counter()
+    
+    @contextmanager
+    def span(self, stage, name, **attrs):
+        if not self.enabled:
+            yield
+            return
+        start = self._mark = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._mark = time.perf_counter()
+            self.records.append({'stage': stage, 'name': name, 'ms': round((self._mark - start) * 1000, 2), **attrs})
+    
+    def lap(self, stage, name, **attrs):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.records.append({'stage': stage, 'name': name, 'ms': round((now - self._mark) * 1000, 2), **attrs})
+        self._mark = now
+
+# The script module is re-executed on every run, so each run gets its own profiler
+PROFILER = Profiler()
+
+def show_chart(fig, name, slimmed=False, **attrs):
+    """st.plotly_chart of the slimmed figure, recording build, slim and render time and payload bytes when profiling"""
+    if not PROFILER.enabled:
+        st.plotly_chart(fig if slimmed else slim_figure(fig), use_container_width=True)
+        return
+    PROFILER.lap('figure', name, **attrs)
+    if not slimmed:
+        built = len(fig.to_json())
+        slim_figure(fig)
+        PROFILER.lap('slim', name, saved=built - len(fig.to_json()))
+    with PROFILER.span('render', name, bytes=len(fig.to_json())):
+        st.plotly_chart(fig, use_container_width=True)
+
+# =============================================================================
+# FIGURE CACHE (shared by all sessions)
+# =============================================================================
+# Total size of the serialized figures kept, and how long one may be reused
+# (0 = until evicted or the dataset version changes)
+FIGURE_CACHE_MB = float(os.environ.get("NOVAMART_FIGURE_CACHE_MB", "64"))
+FIGURE_CACHE_TTL = float(os.environ.get("NOVAMART_FIGURE_CACHE_TTL", "0"))
+
+class FigureCache:
+    """LRU cache of serialized Plotly figures, bounded by their total size in bytes
+
+    Keys are (chart name, dataset versions and widget state). The least
+    recently used figures are evicted once the budget is exceeded, and with a
+    ``ttl`` entries older than that many seconds are rebuilt.
+    """
+    
+    def __init__(self, budget_bytes, ttl=0):
+        self.budget = budget_bytes
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (payload, stored at)
+        self.size = 0
+        self.hits = self.misses = self.evictions = 0
+        self.lock = threading.Lock()
+    
+    def get(self, key):
+        """Serialized figure for a key, or None"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and self.ttl and time.monotonic() - entry[1] > self.ttl:
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+    
+    def put(self, key, payload):
+        with self.lock:
+            if key in self.entries:
+                self._drop(key)
+            if len(payload) > self.budget:
+                return
+            self.entries[key] = (payload, time.monotonic())
+            self.size += len(payload)
+            while self.size > self.budget:
+                self._drop(next(iter(self.entries)))
+                self.evictions += 1
+    
+    def _drop(self, key):
+        payload, _ = self.entries.pop(key)
+        self.size -= len(payload)
+    
+    def stats(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'entries': len(self.entries), 'bytes': self.size, 'budget': self.budget}
+
+@st.cache_resource(show_spinner=False)
+def figure_cache():
+    """The process-wide figure cache"""
+    return FigureCache(int(FIGURE_CACHE_MB * 1e6), FIGURE_CACHE_TTL)
+
+def show_cached_chart(name, key, build):
+    """show_chart for a figure reused from the figure cache, calling build() only on a miss
+
+    ``key`` must hold everything the figure depends on: the version of each
+    dataset it reads and every widget value used by ``build``.
+    """
+    cache = figure_cache()
+    key = (name, *key)
+    payload = cache.get(key)
+    if payload is not None:
+        show_chart(pio.from_json(payload), name, slimmed=True, cache='hit')
+        return
+    fig = build()
+    show_chart(fig, name, cache='miss')  # slims fig in place
+    cache.put(key, fig.to_json())
+
+# =============================================================================
+# PAGED TABLES (sorted, searched and formatted on the server)
+# =============================================================================
+TABLE_PAGE_SIZE = 20
+
+def text_columns(frame):
+    """Columns of a frame that search looks in"""
+    return [col for col, dtype in frame.dtypes.items()
+            if isinstance(dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(dtype)]
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def sorted_rows(token, column, ascending, _frame):
+    """Row positions of a table ordered by one column (stable, missing values last)"""
+    values = _frame[column].reset_index(drop=True)
+    return values.sort_values(ascending=ascending, kind='stable', na_position='last').index.to_numpy()
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def search_mask(token, text, _frame):
+    """Rows of a table with ``text`` in one of its text columns (case-insensitive)"""
+    text = text.lower()
+    mask = np.zeros(len(_frame), dtype=bool)
+    for col in text_columns(_frame):
+        values = _frame[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # Match each category once, then look the rows up by code
+            hits = np.append(values.cat.categories.astype(str).str.lower().str.contains(text, regex=False), False)
+            mask |= hits[values.cat.codes.to_numpy()]
+        else:
+            mask |= values.str.lower().str.contains(text, regex=False, na=False).to_numpy(dtype=bool)
+    return mask
+
+def frame_page(frame, token, sort, ascending, search, offset, limit):
+    """One page of a DataFrame and the number of rows matching ``search``
+
+    ``sort=None`` keeps the frame's own order. The sort order and search
+    matches are cached per ``token``, which must change whenever the frame
+    does (e.g. hold the dataset version).
+    """
+    if sort is None:
+        rows = np.arange(len(frame)) if ascending else np.arange(len(frame))[::-1]
+    else:
+        rows = sorted_rows(token, sort, ascending, frame)
+    if search:
+        rows = rows[search_mask(token, search, frame)[rows]]
+    return frame.take(rows[offset:offset + limit]), len(rows)
+
+def paged_table(fetch, columns, key, formats=None, sort=None, ascending=False, page_size=TABLE_PAGE_SIZE):
+    """Sortable, searchable table that fetches, formats and sends one page at a time
+
+    ``fetch(sort, ascending, search, offset, limit)`` returns the page of rows
+    and the number of rows matching the search, e.g. ``frame_page`` bound to
+    a frame or a query backend's ``table_page`` bound to a dataset.
+    """
+    page_key = f"{key}_page"
+
+    def first_page():
+        st.session_state[page_key] = 1
+
+    @fragment
+    def table():
+        col1, col2, col3, col4 = st.columns([3, 3, 2, 2])
+        with col1:
+            search = st.text_input("Search", key=f"{key}_search", placeholder="Text in any column", on_change=first_page)
+        with col2:
+            # Without a default sort column the table starts in the order it was given
+            options = columns if sort else [None, *columns]
+            sort_by = st.selectbox(
+                "Sort by",
+                options,
+                index=options.index(sort),
+                format_func=lambda col: "Default order" if col is None else col.replace('_', ' ').title(),
+                key=f"{key}_sort",
+                on_change=first_page
+            )
+        with col3:
+            descending = st.toggle("Descending", value=not ascending, key=f"{key}_descending", on_change=first_page)
+
+        # The page input comes last so it can be bounded by the page count
+        page_no = st.session_state.get(page_key, 1)
+        with PROFILER.span('table', key):
+            rows, total = fetch(sort_by, not descending, search.strip(), (page_no - 1) * page_size, page_size)
+            pages = max(1, -(-total // page_size))
+            if page_no > pages:
+                # Only when the data shrank under a kept page; the input is bounded otherwise
+                page_no = st.session_state[page_key] = pages
+                rows, total = fetch(sort_by, not descending, search.strip(), (page_no - 1) * page_size, page_size)
+        with col4:
+            st.number_input("Page", min_value=1, max_value=pages, step=1, key=page_key)
+
+        st.dataframe(rows[columns].style.format(formats or {}), hide_index=True, use_container_width=True)
+        start = (page_no - 1) * page_size
+        st.caption(f"Rows {start + 1 if len(rows) else 0:,}–{start + len(rows):,} of {total:,} · page {page_no:,} of {pages:,}")
+    table()
+
+# =============================================================================
+# PAGE REGISTRY
+# =============================================================================
+PAGES = {}
+
+# st.fragment from Streamlit 1.37, st.experimental_fragment before that
+_st_fragment = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None)
+
+def fragment(fn):
+    """Make a page block rerun on its own when one of its widgets changes
+
+    Without fragment support the page reruns as before. Outside a session
+    (the warm-up thread) Streamlit would skip the block, so it is called directly.
+    """
+    if _st_fragment is None:
+        return fn
+    
+    @functools.wraps(fn)
+    def profiled(*args, **kwargs):
+        ctx = get_script_run_ctx(suppress_warning=True)
+        if ctx is None or not ctx.fragment_ids_this_run:
+            return fn(*args, **kwargs)
+        # A fragment rerun never reaches sidebar_timings: record it on its own profiler
+        global PROFILER
+        previous = PROFILER
+        PROFILER = Profiler(previous.enabled, previous.page)
+        try:
+            with PROFILER.span('fragment', fn.__name__):
+                return fn(*args, **kwargs)
+        finally:
+            keep_fragment_timings(PROFILER, fn.__name__)
+            PROFILER = previous
+    
+    scoped = _st_fragment(profiled)
+    
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        if get_script_run_ctx(suppress_warning=True) is None:
+            return fn(*args, **kwargs)
+        return scoped(*args, **kwargs)
+    return run
+
+def page(title, *tables):
+    """Register a page function under its sidebar title with the datasets it reads"""
+    def register(fn):
+        fn.tables = tables
+        PAGES[title] = fn
+        return fn
+    return register
+
 # =============================================================================
 # SIDEBAR NAVIGATION
 # =============================================================================
@@ -89,15 +1695,7 @@ def sidebar():
         
         page = st.radio(
             "Navigate to:",
-            [
-                "🏠 Executive Overview",
-                "📈 Campaign Analytics",
-                "👥 Customer Insights",
-                "📦 Product Performance",
-                "🗺️ Geographic Analysis",
-                "🎯 Attribution & Funnel",
-                "🤖 ML Model Evaluation"
-            ],
+            list(PAGES),
             label_visibility="collapsed"
         )
         
@@ -112,49 +1710,136 @@ def sidebar():
         
         st.markdown("---")
         st.caption("📧 Questions? Contact your instructor")
+        
+        with st.expander("🛠️ Debug"):
+            PROFILER.enabled = st.toggle(
+                "Record timings",
+                value=os.environ.get("NOVAMART_PROFILE") == "1",
+                key="profiling"
+            )
     
     return page
 
+def export_timings(page, records, **run):
+    """Timing records as JSON lines tagged with the run, appended to NOVAMART_PROFILE_LOG when set"""
+    run = {'run_at': time.time(), 'page': page, **run}
+    lines = "".join(json.dumps({**run, **record}, ensure_ascii=False) + "\n" for record in records)
+    log_file = os.environ.get("NOVAMART_PROFILE_LOG")
+    if log_file:
+        with open(log_file, 'a') as f:
+            f.write(lines)
+    return lines
+
+def keep_fragment_timings(profiler, name):
+    """Log a fragment rerun's timings and keep them for the panel of the next full run"""
+    if not profiler.enabled or not profiler.records:
+        return
+    lines = export_timings(profiler.page, profiler.records, fragment=name)
+    st.session_state['fragment_timings'] = st.session_state.get('fragment_timings', "") + lines
+
+def sidebar_timings(page):
+    """Show this run's timing spans, after those of fragment reruns since the last full run, and offer them as JSON lines"""
+    if not PROFILER.enabled:
+        st.session_state.pop('fragment_timings', None)
+        return
+    lines = st.session_state.pop('fragment_timings', "") + export_timings(page, PROFILER.records)
+    
+    with st.sidebar.expander("⏱️ Timings", expanded=True):
+        timings = pd.DataFrame([json.loads(line) for line in lines.splitlines()]).drop(columns=['run_at', 'page'])
+        st.dataframe(timings, hide_index=True, use_container_width=True)
+        page_ms = timings.loc[timings['stage'] == 'page', 'ms'].sum()
+        st.caption(f"Page total: {page_ms:,.0f} ms")
+        reruns = int((timings['stage'] == 'fragment').sum())
+        if reruns:
+            st.caption(f"Includes {reruns:,} fragment reruns since the last full run")
+        st.download_button("Export JSON lines", lines, file_name="novamart_timings.jsonl", mime="application/json")
+
+def sidebar_figure_cache():
+    """Show the figure cache's counters"""
+    stats = figure_cache().stats()
+    with st.sidebar.expander("🖼️ Figure cache"):
+        lookups = stats['hits'] + stats['misses']
+        st.caption(f"**Hits**: {stats['hits']:,} of {lookups:,} ({stats['hits'] / max(lookups, 1):.0%})  \n"
+                   f"**Evictions**: {stats['evictions']:,}  \n"
+                   f"**Stored**: {stats['entries']:,} figures, {stats['bytes']/1e6:.1f} of {stats['budget']/1e6:.0f} MB")
+
+def sidebar_footprint(data):
+    """Show the before/after memory footprint of the compacted tables loaded for this page"""
+    rows = [(name, *df.attrs['footprint']) for name, df in data.loaded.items() if df.attrs.get('footprint')]
+    if rows:
+        with st.sidebar.expander("💾 Data footprint"):
+            for name, before, after in rows:
+                st.caption(f"**{name}**: {before/1e6:.2f} MB → {after/1e6:.2f} MB ({1 - after/before:.0%} smaller)")
+
 # =============================================================================
 # PAGE: EXECUTIVE OVERVIEW
 # =============================================================================
+@page("🏠 Executive Overview", 'campaigns', 'customers')
 def page_executive_overview(data):
     """Executive Overview - KPIs and key metrics"""
     st.title("🏠 Executive Overview")
     st.markdown("Key performance metrics and trends at a glance")
     
-    campaigns = data['campaigns']
-    customers = data['customers']
+    query = queries(data)
+    campaigns = query.campaigns()
+    cube = campaigns.rollup
+    index = campaigns.index(PrefixIndex)
+    
+    # Reporting period
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        period = st.date_input(
+            "Period",
+            value=(max(index.first, index.last - pd.Timedelta(days=89)), index.last),
+            min_value=index.first,
+            max_value=index.last,
+            key="exec_period"
+        )
+    with col2:
+        comparison = st.selectbox(
+            "Compare with",
+            ["Previous period", "Same period last year"],
+            key="exec_compare"
+        )
+    
+    # The range picker returns a single date while the end is being chosen
+    start, end = (period[0], period[-1]) if isinstance(period, (tuple, list)) else (period, period)
+    with PROFILER.span('aggregate', 'kpis'):
+        current = index.totals(start, end)
+        prev_start, prev_end = comparison_window(start, end, comparison)
+        # No deltas when the comparison window reaches outside the history
+        previous = index.totals(prev_start, prev_end) if index.covers(prev_start, prev_end) else {}
     
     # KPI Cards
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        total_revenue = campaigns['revenue'].sum()
+        total_revenue = current['revenue']
         st.metric(
             "Total Revenue",
             f"₹{total_revenue/1e7:.2f} Cr",
-            delta="YoY Growth"
+            delta=change(total_revenue, previous.get('revenue'))
         )
     
     with col2:
-        total_conversions = campaigns['conversions'].sum()
+        total_conversions = current['conversions']
         st.metric(
             "Total Conversions",
             f"{total_conversions:,.0f}",
-            delta="vs Last Period"
+            delta=change(total_conversions, previous.get('conversions'))
         )
     
     with col3:
-        avg_roas = campaigns[campaigns['roas'] > 0]['roas'].mean()
+        avg_roas = current['roas_sum'] / current['roas_count'] if current['roas_count'] else 0
+        previous_roas = previous['roas_sum'] / previous['roas_count'] if previous.get('roas_count') else None
         st.metric(
             "Average ROAS",
             f"{avg_roas:.2f}x",
-            delta="Return on Ad Spend"
+            delta=change(avg_roas, previous_roas)
         )
     
     with col4:
-        total_customers = len(customers)
+        total_customers = query.row_count('customers')
         st.metric(
             "Total Customers",
             f"{total_customers:,}",
@@ -164,72 +1849,91 @@ def page_executive_overview(data):
     st.markdown("---")
     
     # Revenue Trend
-    st.subheader("📈 Revenue Trend Over Time")
-    
-    # Aggregation level selector
-    col1, col2 = st.columns([3, 1])
-    with col2:
-        agg_level = st.selectbox(
-            "Aggregation",
-            ["Daily", "Weekly", "Monthly"],
-            key="exec_agg"
-        )
-    
-    freq_map = {"Daily": "D", "Weekly": "W", "Monthly": "M"}
-    monthly_revenue = campaigns.groupby(pd.Grouper(key='date', freq=freq_map[agg_level]))['revenue'].sum().reset_index()
-    
-    fig = px.line(
-        monthly_revenue,
-        x='date',
-        y='revenue',
-        title=f'{agg_level} Revenue Trend',
-        labels={'date': 'Date', 'revenue': 'Revenue (₹)'},
-        markers=True
-    )
-    fig.update_layout(
-        hovermode='x unified',
-        height=400,
-        template='plotly_white'
-    )
-    st.plotly_chart(fig, use_container_width=True)
+    @fragment
+    def revenue_trend_section():
+        st.subheader("📈 Revenue Trend Over Time")
+        
+        # Aggregation level selector
+        col1, col2 = st.columns([3, 1])
+        with col2:
+            agg_level = st.selectbox(
+                "Aggregation",
+                ["Daily", "Weekly", "Monthly"],
+                key="exec_agg"
+            )
+        
+        def build():
+            freq_map = {"Daily": "D", "Weekly": "W", "Monthly": "M"}
+            with PROFILER.span('aggregate', 'revenue_trend'):
+                monthly_revenue = rollup_by_period(cube, freq_map[agg_level], 'revenue')
+        
+            fig = px.line(
+                monthly_revenue,
+                x='date',
+                y='revenue',
+                title=f'{agg_level} Revenue Trend',
+                labels={'date': 'Date', 'revenue': 'Revenue (₹)'},
+                markers=True
+            )
+            fig.update_layout(
+                hovermode='x unified',
+                height=400,
+                template='plotly_white'
+            )
+            return fig
+        show_cached_chart("revenue_trend", (campaigns.version, agg_level), build)
+    revenue_trend_section()
     
     # Channel Performance
-    st.subheader("📊 Revenue by Channel")
-    
-    # Metric selector
-    col1, col2 = st.columns([3, 1])
-    with col2:
-        metric = st.selectbox(
-            "Metric",
-            ["Revenue", "Conversions", "ROAS"],
-            key="channel_metric"
-        )
-    
-    metric_col = metric.lower() if metric in ['Revenue', 'Conversions'] else 'roas'
-    channel_data = campaigns.groupby('channel')[metric_col].sum().sort_values(ascending=True).reset_index()
-    
-    fig = px.bar(
-        channel_data,
-        x=metric_col,
-        y='channel',
-        orientation='h',
-        title=f'Total {metric} by Marketing Channel',
-        labels={metric_col: f'{metric} (₹)' if metric != 'ROAS' else f'{metric}', 'channel': 'Channel'},
-        color='channel',
-        color_discrete_sequence=px.colors.qualitative.Set2
-    )
-    fig.update_layout(height=400, showlegend=False, template='plotly_white')
-    st.plotly_chart(fig, use_container_width=True)
+    @fragment
+    def channel_performance_section():
+        st.subheader("📊 Revenue by Channel")
+        
+        # Metric selector
+        col1, col2 = st.columns([3, 1])
+        with col2:
+            metric = st.selectbox(
+                "Metric",
+                ["Revenue", "Conversions", "ROAS"],
+                key="channel_metric"
+            )
+        
+        def build():
+            metric_col = metric.lower() if metric in ['Revenue', 'Conversions'] else 'roas'
+            with PROFILER.span('aggregate', 'channel_performance'):
+                channel_data = pd.DataFrame.from_dict(
+                    {channel: index.totals(start, end, channel) for channel in index.groups}, orient='index'
+                ).rename_axis('channel')
+                channel_data = channel_data[channel_data['spend'] > 0]
+                channel_data['roas'] = channel_data['revenue'] / channel_data['spend']
+                channel_data = channel_data[metric_col].sort_values(ascending=True).reset_index()
+        
+            fig = px.bar(
+                channel_data,
+                x=metric_col,
+                y='channel',
+                orientation='h',
+                title=f'Total {metric} by Marketing Channel' if metric != 'ROAS' else 'ROAS (Revenue / Spend) by Marketing Channel',
+                labels={metric_col: f'{metric} (₹)' if metric != 'ROAS' else f'{metric}', 'channel': 'Channel'},
+                color='channel',
+                color_discrete_sequence=px.colors.qualitative.Set2
+            )
+            fig.update_layout(height=400, showlegend=False, template='plotly_white')
+            return fig
+        show_cached_chart("channel_performance", (campaigns.version, metric, start, end), build)
+    channel_performance_section()
 
 # =============================================================================
 # PAGE: CAMPAIGN ANALYTICS
 # =============================================================================
+@page("📈 Campaign Analytics", 'campaigns')
 def page_campaign_analytics(data):
     """Campaign Analytics - Temporal and comparison analysis"""
     st.title("📈 Campaign Analytics")
     st.markdown("Analyze campaign performance across channels, regions, and time periods")
     
-    campaigns = data['campaigns']
+    campaigns = queries(data).campaigns()
+    cube = campaigns.rollup
     
     # Filters in expandable section
     with st.expander("🔍 Filter Options", expanded=True):
@@ -238,291 +1942,439 @@ def page_campaign_analytics(data):
         with col1:
             selected_channels = st.multiselect(
                 "Select Channels",
-                options=sorted(campaigns['channel'].unique()),
-                default=sorted(campaigns['channel'].unique())
+                options=sorted(cube['channel'].unique()),
+                default=sorted(cube['channel'].unique())
             )
         
         with col2:
             selected_regions = st.multiselect(
                 "Select Regions",
-                options=sorted(campaigns['region'].unique()),
-                default=sorted(campaigns['region'].unique())
+                options=sorted(cube['region'].unique()),
+                default=sorted(cube['region'].unique())
             )
         
         with col3:
             date_range = st.date_input(
                 "Date Range",
-                value=(campaigns['date'].min(), campaigns['date'].max()),
-                min_value=campaigns['date'].min(),
-                max_value=campaigns['date'].max()
+                value=(cube['date'].min(), cube['date'].max()),
+                min_value=cube['date'].min(),
+                max_value=cube['date'].max()
             )
     
-    # Apply filters
-    filtered = campaigns[
-        (campaigns['channel'].isin(selected_channels)) &
-        (campaigns['region'].isin(selected_regions)) &
-        (campaigns['date'] >= pd.to_datetime(date_range[0])) &
-        (campaigns['date'] <= pd.to_datetime(date_range[1]))
-    ]
+    # Apply filters through the rollup index
+    with PROFILER.span('filter', 'campaign_filters'):
+        rows = campaigns.index(CampaignIndex).positions(
+            date_range[0], date_range[1],
+            channel=selected_channels,
+            region=selected_regions
+        )
+        filtered = cube.take(rows)
     
     if filtered.empty:
         st.warning("⚠️ No data available for selected filters")
         return
-    
+
+    # Figure cache key shared by the charts below
+    filter_key = (campaigns.version, tuple(selected_channels), tuple(selected_regions), tuple(date_range))
+
     st.markdown("---")
-    
+
     # Regional Performance by Quarter
     st.subheader("📊 Regional Performance by Quarter")
     
-    regional_quarterly = filtered.groupby(['region', 'quarter'])['revenue'].sum().reset_index()
+    def build():
+        with PROFILER.span('aggregate', 'regional_quarterly'):
+            regional_quarterly = filtered.groupby(['region', 'quarter'], observed=True)['revenue'].sum().reset_index()
     
-    fig = px.bar(
-        regional_quarterly,
-        x='quarter',
-        y='revenue',
-        color='region',
-        barmode='group',
-        title='Revenue by Region and Quarter',
-        labels={'revenue': 'Revenue (₹)', 'quarter': 'Quarter', 'region': 'Region'}
-    )
-    fig.update_layout(height=400, template='plotly_white')
-    st.plotly_chart(fig, use_container_width=True)
+        fig = px.bar(
+            regional_quarterly,
+            x='quarter',
+            y='revenue',
+            color='region',
+            barmode='group',
+            title='Revenue by Region and Quarter',
+            labels={'revenue': 'Revenue (₹)', 'quarter': 'Quarter', 'region': 'Region'}
+        )
+        fig.update_layout(height=400, template='plotly_white')
+        return fig
+    show_cached_chart("regional_quarterly", filter_key, build)
     
     # Channel Contribution Over Time
     st.subheader("📈 Channel Contribution Over Time")
     
-    channel_time = filtered.groupby([pd.Grouper(key='date', freq='W'), 'channel'])['conversions'].sum().reset_index()
-    
-    fig = px.area(
-        channel_time,
-        x='date',
-        y='conversions',
-        color='channel',
-        title='Weekly Conversions by Channel (Stacked)',
-        labels={'date': 'Week', 'conversions': 'Conversions', 'channel': 'Channel'}
-    )
-    fig.update_layout(height=400, hovermode='x unified', template='plotly_white')
-    st.plotly_chart(fig, use_container_width=True)
-    
-    # Campaign Type Breakdown
-    st.subheader("💰 Campaign Type Spend Distribution")
-    
-    col1, col2 = st.columns([3, 1])
-    with col2:
-        view_type = st.selectbox("View", ["Absolute", "100% Stacked"], key="campaign_view")
-    
-    campaign_monthly = filtered.groupby([pd.Grouper(key='date', freq='M'), 'campaign_type'])['spend'].sum().reset_index()
+    def build():
+        with PROFILER.span('aggregate', 'channel_contribution'):
+            channel_time = rollup_by_period(filtered, 'W', 'conversions', by=['channel'])
     
-    if view_type == "100% Stacked":
-        fig = px.bar(
-            campaign_monthly,
-            x='date',
-            y='spend',
-            color='campaign_type',
-            barmode='relative',
-            title='Campaign Type Contribution (100% Stacked)',
-            labels={'spend': 'Spend %', 'date': 'Month', 'campaign_type': 'Campaign Type'}
-        )
-    else:
-        fig = px.bar(
-            campaign_monthly,
+        fig = px.area(
+            channel_time,
             x='date',
-            y='spend',
-            color='campaign_type',
-            barmode='stack',
-            title='Campaign Type Spend (Absolute)',
-            labels={'spend': 'Spend (₹)', 'date': 'Month', 'campaign_type': 'Campaign Type'}
+            y='conversions',
+            color='channel',
+            title='Weekly Conversions by Channel (Stacked)',
+            labels={'date': 'Week', 'conversions': 'Conversions', 'channel': 'Channel'}
         )
+        fig.update_layout(height=400, hovermode='x unified', template='plotly_white')
+        return fig
+    show_cached_chart("channel_contribution", filter_key, build)
     
-    fig.update_layout(height=400, template='plotly_white')
-    st.plotly_chart(fig, use_container_width=True)
+    # Campaign Type Breakdown
+    @fragment
+    def campaign_type_section():
+        st.subheader("💰 Campaign Type Spend Distribution")
+        
+        col1, col2 = st.columns([3, 1])
+        with col2:
+            view_type = st.selectbox("View", ["Absolute", "100% Stacked"], key="campaign_view")
+        
+        def build():
+            with PROFILER.span('aggregate', 'campaign_type_spend'):
+                campaign_monthly = rollup_by_period(filtered, 'M', 'spend', by=['campaign_type'])
+        
+            if view_type == "100% Stacked":
+                fig = px.bar(
+                    campaign_monthly,
+                    x='date',
+                    y='spend',
+                    color='campaign_type',
+                    barmode='relative',
+                    title='Campaign Type Contribution (100% Stacked)',
+                    labels={'spend': 'Spend %', 'date': 'Month', 'campaign_type': 'Campaign Type'}
+                )
+            else:
+                fig = px.bar(
+                    campaign_monthly,
+                    x='date',
+                    y='spend',
+                    color='campaign_type',
+                    barmode='stack',
+                    title='Campaign Type Spend (Absolute)',
+                    labels={'spend': 'Spend (₹)', 'date': 'Month', 'campaign_type': 'Campaign Type'}
+                )
+        
+            fig.update_layout(height=400, template='plotly_white')
+            return fig
+        show_cached_chart("campaign_type_spend", (*filter_key, view_type), build)
+    campaign_type_section()
 
 # =============================================================================
 # PAGE: CUSTOMER INSIGHTS
 # =============================================================================
+@page("👥 Customer Insights", 'customers')
 def page_customer_insights(data):
     """Customer Insights - Distributions and relationships"""
     st.title("👥 Customer Insights")
     st.markdown("Analyze customer demographics, behavior, and lifetime value")
     
     customers = data['customers']
+    version = dataset_version('customers')
+    colors = px.colors.qualitative.Plotly
     
     col1, col2 = st.columns(2)
     
-    # Age Distribution
+    # Age Distribution (binned on the server, box marginal from precomputed quartiles)
     with col1:
-        st.subheader("📊 Age Distribution")
-        
-        bin_size = st.slider("Bin Width", min_value=2, max_value=10, value=5, key="age_bin")
-        
-        fig = px.histogram(
-            customers,
-            x='age',
-            nbins=int((customers['age'].max() - customers['age'].min()) / bin_size),
-            title='Customer Age Distribution',
-            labels={'age': 'Age', 'count': 'Number of Customers'},
-            color_discrete_sequence=['#636EFA'],
-            marginal='box'
-        )
-        fig.update_layout(height=400, template='plotly_white')
-        st.plotly_chart(fig, use_container_width=True)
-    
-    # LTV by Segment
+        @fragment
+        def age_distribution_section():
+            st.subheader("📊 Age Distribution")
+            
+            bin_size = st.slider("Bin Width", min_value=2, max_value=10, value=5, key="age_bin")
+            def build():
+                edges, counts, age_box = age_histogram(version, bin_size)
+            
+                from plotly.subplots import make_subplots
+                fig = make_subplots(rows=2, cols=1, shared_xaxes=True, row_heights=[0.2, 0.8], vertical_spacing=0.03)
+                fig.add_trace(go.Box(
+                    y=['Age'], q1=[age_box['q1']], median=[age_box['median']], q3=[age_box['q3']],
+                    lowerfence=[age_box['lowerfence']], upperfence=[age_box['upperfence']],
+                    orientation='h', marker_color='#636EFA', hoverinfo='x', name='Age'
+                ), row=1, col=1)
+                fig.add_trace(go.Bar(
+                    x=(edges[:-1] + edges[1:]) / 2,
+                    y=counts,
+                    width=bin_size,
+                    marker_color='#636EFA',
+                    name='Customers',
+                    customdata=np.column_stack([edges[:-1], edges[1:]]),
+                    hovertemplate='Age %{customdata[0]:.0f}-%{customdata[1]:.0f}<br>Customers: %{y:,}<extra></extra>'
+                ), row=2, col=1)
+                fig.update_yaxes(visible=False, row=1, col=1)
+                fig.update_xaxes(title_text='Age', row=2, col=1)
+                fig.update_yaxes(title_text='Number of Customers', row=2, col=1)
+                fig.update_layout(title='Customer Age Distribution', bargap=0.05, showlegend=False,
+                                  height=400, template='plotly_white')
+                return fig
+            show_cached_chart("age_distribution", (version, bin_size), build)
+        age_distribution_section()
+    
+    # LTV by Segment (box statistics computed on the server)
     with col2:
         st.subheader("📦 Lifetime Value by Segment")
         
-        fig = px.box(
-            customers,
-            x='customer_segment',
-            y='lifetime_value',
-            color='customer_segment',
-            title='LTV Distribution by Customer Segment',
-            labels={'customer_segment': 'Segment', 'lifetime_value': 'Lifetime Value (₹)'},
-            points='outliers'
-        )
-        fig.update_layout(height=400, showlegend=False, template='plotly_white')
-        st.plotly_chart(fig, use_container_width=True)
+        def build():
+            fig = go.Figure()
+            for i, (segment, stats) in enumerate(grouped_distribution(version, 'lifetime_value', 'customer_segment').items()):
+                color = colors[i % len(colors)]
+                fig.add_trace(go.Box(
+                    x=[segment], q1=[stats['q1']], median=[stats['median']], q3=[stats['q3']],
+                    lowerfence=[stats['lowerfence']], upperfence=[stats['upperfence']],
+                    name=segment, marker_color=color
+                ))
+                fig.add_trace(go.Scatter(
+                    x=[segment] * len(stats['outliers']), y=stats['outliers'],
+                    mode='markers', marker=dict(color=color, size=4), name=segment,
+                    hovertemplate='Outlier: ₹%{y:,.0f}<extra></extra>'
+                ))
+            fig.update_layout(
+                title='LTV Distribution by Customer Segment',
+                xaxis_title='Segment',
+                yaxis_title='Lifetime Value (₹)',
+                height=400, showlegend=False, template='plotly_white'
+            )
+            return fig
+        show_cached_chart("ltv_by_segment", (version,), build)
     
     st.markdown("---")
     
     # Income vs LTV Scatter
-    st.subheader("🔵 Income vs Lifetime Value")
+    @fragment
+    def income_vs_ltv_section():
+        st.subheader("🔵 Income vs Lifetime Value")
+        
+        version = dataset_version('customers')
+        col1, col2 = st.columns([3, 1])
+        with col2:
+            show_trend = st.checkbox("Show Trend Line", value=False)
+            render_mode = st.radio("Render", ["Auto", "Points", "Density"], horizontal=True, key="scatter_mode")
+        
+        # Zoom into a region; Auto switches back to points once few enough customers are in view
+        income_bounds = (int(customers['income'].min()), int(customers['income'].max()) + 1)
+        ltv_bounds = (int(customers['lifetime_value'].min()), int(customers['lifetime_value'].max()) + 1)
+        with st.expander("🔍 Zoom"):
+            income_range = st.slider("Income range (₹)", *income_bounds, value=income_bounds, key="scatter_income")
+            ltv_range = st.slider("Lifetime value range (₹)", *ltv_bounds, value=ltv_bounds, key="scatter_ltv")
+        
+        in_view = customers[
+            customers['income'].between(*income_range) & customers['lifetime_value'].between(*ltv_range)
+        ]
+        if render_mode == "Auto":
+            render_mode = "Points" if len(in_view) <= SCATTER_POINT_LIMIT else "Density"
+        
+        # Trend line fitted once on all customers, without grouping by color
+        trend = None
+        if show_trend:
+            try:
+                trend = customer_trend(version)
+            except ImportError:
+                st.warning("⚠️ Install scipy for trend line: pip install scipy")
+        
+        def build():
+            labels = {'income': 'Annual Income (₹)', 'lifetime_value': 'Lifetime Value (₹)', 'customer_segment': 'Segment'}
+            if render_mode == "Points":
+                # WebGL scatter of the customers in view
+                fig = px.scatter(
+                    in_view,
+                    x='income',
+                    y='lifetime_value',
+                    color='customer_segment',
+                    size='total_purchases',
+                    hover_data=['age', 'tenure_months', 'satisfaction_score'],
+                    title='Income vs Lifetime Value by Customer Segment',
+                    labels=labels,
+                    opacity=0.7,
+                    render_mode='webgl'
+                )
+            else:
+                # Density binned on the server; only the bin grid is sent to the browser
+                counts, x_edges, y_edges = income_ltv_density(version, income_range, ltv_range)
+                fig = go.Figure(go.Heatmap(
+                    x=(x_edges[:-1] + x_edges[1:]) / 2,
+                    y=(y_edges[:-1] + y_edges[1:]) / 2,
+                    z=np.where(counts.T > 0, counts.T, np.nan),
+                    colorscale='Blues',
+                    colorbar=dict(title='Customers'),
+                    hovertemplate='Income: ₹%{x:,.0f}<br>LTV: ₹%{y:,.0f}<br>Customers: %{z:,.0f}<extra></extra>'
+                ))
+                fig.update_layout(
+                    title=f'Income vs Lifetime Value - Customer Density ({len(in_view):,} customers)',
+                    xaxis_title=labels['income'],
+                    yaxis_title=labels['lifetime_value']
+                )
+            
+            if trend is not None:
+                slope, intercept, r_squared = trend
+                x_trend = np.array(income_range, dtype=float)
+                y_trend = slope * x_trend + intercept
+                
+                fig.add_trace(go.Scatter(
+                    x=x_trend, 
+                    y=y_trend,
+                    mode='lines',
+                    name=f'Trend (R²={r_squared:.3f})',
+                    line=dict(color='red', width=2, dash='dash'),
+                    hovertemplate='Trend Line<br>Income: ₹%{x:,.0f}<br>LTV: ₹%{y:,.0f}<extra></extra>'
+                ))
+            
+            fig.update_layout(height=450, template='plotly_white')
+            return fig
+        show_cached_chart("income_vs_ltv", (version, render_mode, income_range, ltv_range, trend), build)
+    income_vs_ltv_section()
     
-    col1, col2 = st.columns([3, 1])
-    with col2:
-        show_trend = st.checkbox("Show Trend Line", value=False)
-    
-    # Create scatter plot
-    fig = px.scatter(
-        customers,
-        x='income',
-        y='lifetime_value',
-        color='customer_segment',
-        size='total_purchases',
-        hover_data=['age', 'tenure_months', 'satisfaction_score'],
-        title='Income vs Lifetime Value by Customer Segment',
-        labels={'income': 'Annual Income (₹)', 'lifetime_value': 'Lifetime Value (₹)', 'customer_segment': 'Segment'},
-        opacity=0.7
-    )
+    st.markdown("---")
     
-    # Add trend line if selected (without grouping by color)
-    if show_trend:
-        try:
-            from scipy import stats
-            # Calculate overall trend line
-            valid_data = customers.dropna(subset=['income', 'lifetime_value'])
-            slope, intercept, r_value, p_value, std_err = stats.linregress(valid_data['income'], valid_data['lifetime_value'])
-            x_trend = np.array([customers['income'].min(), customers['income'].max()])
-            y_trend = slope * x_trend + intercept
-            
+    # Satisfaction Distribution (KDE and box statistics computed on the server)
+    st.subheader("😊 Satisfaction Score by NPS Category")
+    
+    def build():
+        fig = go.Figure()
+        groups = grouped_distribution(version, 'satisfaction_score', 'nps_category', with_kde=True)
+        for i, (category, stats) in enumerate(groups.items()):
+            color = colors[i % len(colors)]
+            grid, density = stats['kde']
+            half_width = 0.4 * density / density.max()
             fig.add_trace(go.Scatter(
-                x=x_trend, 
-                y=y_trend,
-                mode='lines',
-                name=f'Trend (R²={r_value**2:.3f})',
-                line=dict(color='red', width=2, dash='dash'),
-                hovertemplate='Trend Line<br>Income: ₹%{x:,.0f}<br>LTV: ₹%{y:,.0f}<extra></extra>'
+                x=np.concatenate([i - half_width, (i + half_width)[::-1]]),
+                y=np.concatenate([grid, grid[::-1]]),
+                fill='toself', mode='lines', line=dict(color=color, width=1), opacity=0.6,
+                name=category, hoverinfo='name'
             ))
-        except ImportError:
-            st.warning("⚠️ Install scipy for trend line: pip install scipy")
-    
-    fig.update_layout(height=450, template='plotly_white')
-    st.plotly_chart(fig, use_container_width=True)
+            fig.add_trace(go.Box(
+                x=[i], q1=[stats['q1']], median=[stats['median']], q3=[stats['q3']],
+                lowerfence=[stats['lowerfence']], upperfence=[stats['upperfence']],
+                width=0.08, fillcolor='white', line=dict(color=color), name=category
+            ))
+            fig.add_trace(go.Scatter(
+                x=[i] * len(stats['outliers']), y=stats['outliers'],
+                mode='markers', marker=dict(color=color, size=4), name=category
+            ))
+        fig.update_layout(
+            title='Satisfaction Distribution by NPS Category',
+            xaxis=dict(title='NPS Category', tickvals=list(range(len(groups))), ticktext=list(groups)),
+            yaxis_title='Satisfaction Score',
+            height=400, showlegend=False, template='plotly_white'
+        )
+        return fig
+    show_cached_chart("satisfaction_by_nps", (version,), build)
     
     st.markdown("---")
     
-    # Satisfaction Distribution
-    st.subheader("😊 Satisfaction Score by NPS Category")
-    
-    fig = px.violin(
-        customers,
-        x='nps_category',
-        y='satisfaction_score',
-        color='nps_category',
-        box=True,
-        points='outliers',
-        title='Satisfaction Distribution by NPS Category',
-        labels={'nps_category': 'NPS Category', 'satisfaction_score': 'Satisfaction Score'}
+    # Customer Details (sorted, searched and paged on the server)
+    st.subheader("📋 Customer Details")
+    
+    paged_table(
+        functools.partial(queries(data).table_page, 'customers', CUSTOMER_TABLE_COLUMNS),
+        CUSTOMER_TABLE_COLUMNS,
+        key="customer_table",
+        formats={
+            'income': '₹{:,.0f}',
+            'lifetime_value': '₹{:,.0f}',
+            'satisfaction_score': '{:.2f}',
+            'churn_probability': '{:.1%}'
+        },
+        sort='lifetime_value'
     )
-    fig.update_layout(height=400, showlegend=False, template='plotly_white')
-    st.plotly_chart(fig, use_container_width=True)
 
 # =============================================================================
 # PAGE: PRODUCT PERFORMANCE
 # =============================================================================
+@page("📦 Product Performance", 'products')
 def page_product_performance(data):
     """Product Performance - Hierarchy and category analysis"""
     st.title("📦 Product Performance")
     st.markdown("Explore product sales, margins, and category performance")
     
-    products = data['products']
+    query = queries(data)
     
     # Product Hierarchy Treemap
-    st.subheader("🌳 Product Sales Hierarchy")
-    
-    col1, col2 = st.columns([3, 1])
-    with col2:
-        color_metric = st.selectbox(
-            "Color by",
-            ["profit_margin", "sales", "units_sold"],
-            key="treemap_color"
-        )
-    
-    fig = px.treemap(
-        products,
-        path=['category', 'subcategory', 'product_name'],
-        values='sales',
-        color=color_metric,
-        color_continuous_scale='RdYlGn' if color_metric == 'profit_margin' else 'Blues',
-        title=f'Product Sales Hierarchy (Size: Sales, Color: {color_metric.replace("_", " ").title()})',
-        hover_data=['profit_margin', 'sales', 'units_sold']
-    )
-    fig.update_layout(height=600, template='plotly_white')
-    st.plotly_chart(fig, use_container_width=True)
+    @fragment
+    def treemap_section():
+        st.subheader("🌳 Product Sales Hierarchy")
+        
+        col1, col2 = st.columns([3, 1])
+        with col2:
+            color_metric = st.selectbox(
+                "Color by",
+                ["profit_margin", "sales", "units_sold"],
+                key="treemap_color"
+            )
+            top_n = st.slider(
+                "Items per group",
+                3, 30, HIERARCHY_TOP_N,
+                key="treemap_top_n",
+                help="Smaller products and subcategories of each group are merged into \"Other\""
+            )
+        
+        def build():
+            with PROFILER.span('aggregate', 'product_treemap'):
+                nodes = hierarchy_nodes(query.product_tree(), ['category', 'subcategory', 'product_name'], top_n, color_metric)
+            
+            fig = go.Figure(go.Treemap(
+                ids=nodes['id'],
+                labels=nodes['label'],
+                parents=nodes['parent'],
+                values=nodes['sales'],
+                branchvalues='total',
+                marker=dict(
+                    colors=nodes['color'],
+                    colorscale='RdYlGn' if color_metric == 'profit_margin' else 'Blues',
+                    colorbar=dict(title=color_metric.replace("_", " ").title())
+                ),
+                customdata=nodes[['profit_margin', 'units_sold']],
+                hovertemplate=HIERARCHY_HOVER
+            ))
+            fig.update_layout(
+                title=f'Product Sales Hierarchy (Size: Sales, Color: {color_metric.replace("_", " ").title()})',
+                height=600,
+                template='plotly_white'
+            )
+            return fig
+        show_cached_chart("product_treemap", (dataset_version('products'), color_metric, top_n), build)
+    treemap_section()
     
     st.markdown("---")
     
     # Category Performance
     st.subheader("📊 Category Performance by Region")
     
-    category_region = products.groupby(['category', 'region']).agg({
-        'sales': 'sum',
-        'profit_margin': 'mean',
-        'units_sold': 'sum'
-    }).reset_index()
-    
     col1, col2 = st.columns(2)
     
     with col1:
-        fig = px.sunburst(
-            category_region,
-            path=['category', 'region'],
-            values='sales',
-            title='Sales Distribution: Category → Region',
-            color='profit_margin',
-            color_continuous_scale='Viridis'
-        )
-        fig.update_layout(height=500, template='plotly_white')
-        st.plotly_chart(fig, use_container_width=True)
+        def build():
+            with PROFILER.span('aggregate', 'category_sunburst'):
+                nodes = hierarchy_nodes(query.category_by_region(), ['category', 'region'], HIERARCHY_TOP_N)
+            
+            fig = go.Figure(go.Sunburst(
+                ids=nodes['id'],
+                labels=nodes['label'],
+                parents=nodes['parent'],
+                values=nodes['sales'],
+                branchvalues='total',
+                marker=dict(colors=nodes['profit_margin'], colorscale='Viridis', colorbar=dict(title='Profit Margin')),
+                customdata=nodes[['profit_margin', 'units_sold']],
+                hovertemplate=HIERARCHY_HOVER
+            ))
+            fig.update_layout(title='Sales Distribution: Category → Region', height=500, template='plotly_white')
+            return fig
+        show_cached_chart("category_sunburst", (dataset_version('products'),), build)
     
     with col2:
         # Top products table
         st.subheader("Top Products by Sales")
         
-        top_products = products.nlargest(10, 'sales')[['product_name', 'category', 'sales', 'profit_margin', 'region']]
-        
-        st.dataframe(
-            top_products.style.format({
-                'sales': '₹{:,.0f}',
-                'profit_margin': '{:.1f}%'
-            }),
-            use_container_width=True,
-            height=500
+        # Every sales row, ranked and paged on the server
+        paged_table(
+            functools.partial(query.table_page, 'products', TOP_PRODUCT_COLUMNS),
+            TOP_PRODUCT_COLUMNS,
+            key="top_products",
+            formats={'sales': '₹{:,.0f}', 'profit_margin': '{:.1f}%'},
+            sort='sales',
+            page_size=10
         )
 
 # =============================================================================
 # PAGE: GEOGRAPHIC ANALYSIS
 # =============================================================================
+@page("🗺️ Geographic Analysis", 'geographic')
 def page_geographic_analysis(data):
     """Geographic Analysis - State-level metrics"""
     st.title("🗺️ Geographic Analysis")
@@ -530,41 +2382,50 @@ def page_geographic_analysis(data):
     
     geo = data['geographic']
     
-    col1, col2 = st.columns([3, 1])
-    with col2:
-        metric = st.selectbox(
-            "Metric",
-            ['total_revenue', 'total_customers', 'market_penetration', 'yoy_growth', 'customer_satisfaction'],
-            key="geo_metric"
-        )
-    
-    # Bubble Map
-    st.subheader("📍 State-wise Performance Map")
-    
-    fig = px.scatter_geo(
-        geo,
-        lat='latitude',
-        lon='longitude',
-        size=metric,
-        color='customer_satisfaction',
-        hover_name='state',
-        hover_data=['total_revenue', 'total_customers', 'store_count', 'market_penetration'],
-        title=f'State Performance - {metric.replace("_", " ").title()}',
-        size_max=50,
-        color_continuous_scale='RdYlGn',
-        scope='asia',
-        projection='natural earth'
-    )
-    
-    fig.update_geos(
-        center=dict(lat=20.5937, lon=78.9629),
-        projection_scale=4,
-        showland=True,
-        landcolor='rgb(243, 243, 243)',
-        countrycolor='rgb(200, 200, 200)'
-    )
-    fig.update_layout(height=600, template='plotly_white')
-    st.plotly_chart(fig, use_container_width=True)
+    @fragment
+    def state_map_section():
+        col1, col2 = st.columns([3, 1])
+        with col2:
+            metric = st.selectbox(
+                "Metric",
+                ['total_revenue', 'total_customers', 'market_penetration', 'yoy_growth', 'customer_satisfaction'],
+                key="geo_metric"
+            )
+        
+        # Bubble Map
+        st.subheader("📍 State-wise Performance Map")
+        
+        def build():
+            # Bubble area by magnitude: yoy_growth can be negative, which plotly rejects as a size
+            fig = px.scatter_geo(
+                geo.assign(bubble_size=geo[metric].abs()),
+                lat='latitude',
+                lon='longitude',
+                size='bubble_size',
+                color='customer_satisfaction',
+                hover_name='state',
+                hover_data={
+                    'total_revenue': True, 'total_customers': True, 'store_count': True,
+                    'market_penetration': True, metric: True, 'bubble_size': False
+                },
+                title=f'State Performance - {metric.replace("_", " ").title()}',
+                size_max=50,
+                color_continuous_scale='RdYlGn',
+                scope='asia',
+                projection='natural earth'
+            )
+        
+            fig.update_geos(
+                center=dict(lat=20.5937, lon=78.9629),
+                projection_scale=4,
+                showland=True,
+                landcolor='rgb(243, 243, 243)',
+                countrycolor='rgb(200, 200, 200)'
+            )
+            fig.update_layout(height=600, template='plotly_white')
+            return fig
+        show_cached_chart("state_map", (dataset_version('geographic'), metric), build)
+    state_map_section()
     
     st.markdown("---")
     
@@ -572,27 +2433,30 @@ def page_geographic_analysis(data):
     st.subheader("📊 State-wise Metrics Table")
     
     display_cols = ['state', 'region', 'total_customers', 'total_revenue', 'market_penetration', 'yoy_growth', 'customer_satisfaction']
-    geo_display = geo[display_cols].sort_values('total_revenue', ascending=False)
-    
-    st.dataframe(
-        geo_display.style.format({
+    paged_table(
+        functools.partial(frame_page, geo[display_cols], ('geographic', dataset_version('geographic'))),
+        display_cols,
+        key="state_table",
+        formats={
             'total_revenue': '₹{:,.0f}',
             'market_penetration': '{:.1f}%',
             'yoy_growth': '{:.1f}%',
             'customer_satisfaction': '{:.1f}%'
-        }),
-        use_container_width=True
+        },
+        sort='total_revenue'
     )
 
 # =============================================================================
 # PAGE: ATTRIBUTION & FUNNEL
 # =============================================================================
+@page("🎯 Attribution & Funnel", 'journey', 'funnel', 'correlation')
 def page_attribution_funnel(data):
     """Attribution & Funnel - Attribution models and conversion funnel"""
     st.title("🎯 Attribution & Funnel Analysis")
     st.markdown("Understand channel attribution and customer journey conversion")
     
-    attribution = data['attribution']
+    data['journey']  # loads (and validates) the paths the attribution is computed from
+    attribution = journey_attribution(dataset_version('journey'))
     funnel = data['funnel']
     correlation = data['correlation']
     
@@ -600,25 +2464,31 @@ def page_attribution_funnel(data):
     
     # Attribution Model
     with col1:
-        st.subheader("🍩 Channel Attribution")
-        
-        model = st.selectbox(
-            "Select Attribution Model",
-            ['first_touch', 'last_touch', 'linear', 'time_decay', 'position_based'],
-            format_func=lambda x: x.replace('_', ' ').title(),
-            key="attribution_model"
-        )
-        
-        fig = px.pie(
-            attribution,
-            values=model,
-            names='channel',
-            hole=0.4,
-            title=f'Channel Attribution - {model.replace("_", " ").title()}',
-            color_discrete_sequence=px.colors.qualitative.Set3
-        )
-        fig.update_layout(height=500, template='plotly_white')
-        st.plotly_chart(fig, use_container_width=True)
+        @fragment
+        def attribution_section():
+            st.subheader("🍩 Channel Attribution")
+            
+            model = st.selectbox(
+                "Select Attribution Model",
+                ATTRIBUTION_MODELS,
+                format_func=lambda x: x.replace('_', ' ').title(),
+                key="attribution_model"
+            )
+            
+            def build():
+                fig = px.pie(
+                    attribution,
+                    values=model,
+                    names='channel',
+                    hole=0.4,
+                    title=f'Channel Attribution - {model.replace("_", " ").title()}',
+                    color_discrete_sequence=px.colors.qualitative.Set3
+                )
+                fig.update_layout(height=500, template='plotly_white')
+                return fig
+            show_cached_chart("channel_attribution", (dataset_version('journey'), model), build)
+            st.caption("Credit computed from the converting paths in the customer journey data")
+        attribution_section()
     
     # Funnel
     with col2:
@@ -640,7 +2510,7 @@ def page_attribution_funnel(data):
             height=500,
             template='plotly_white'
         )
-        st.plotly_chart(fig, use_container_width=True)
+        show_chart(fig, "conversion_funnel")
     
     st.markdown("---")
     
@@ -661,22 +2531,24 @@ def page_attribution_funnel(data):
         funnel_calc['drop_off'] = funnel_calc['conversions'].shift(1) - funnel_calc['conversions']
         funnel_calc['drop_off_pct'] = (funnel_calc['drop_off'] / funnel_calc['conversions'].shift(1) * 100).round(2)
         
-        st.dataframe(
-            funnel_calc[['stage', 'conversions', 'conversion_rate', 'drop_off_pct']].style.format({
-                'conversions': '{:,.0f}',
-                'conversion_rate': '{:.2f}%',
-                'drop_off_pct': '{:.2f}%'
-            }),
-            use_container_width=True
-        )
+        funnel_columns = ['stage', 'conversions', 'conversion_rate', 'drop_off_pct']
+        funnel_formats = {
+            'conversions': '{:,.0f}',
+            'conversion_rate': '{:.2f}%',
+            'drop_off_pct': '{:.2f}%'
+        }
     else:
         # If only conversion_rate data available, display that
-        st.dataframe(
-            funnel_calc[['stage', 'conversion_rate']].style.format({
-                'conversion_rate': '{:.2f}%'
-            }),
-            use_container_width=True
-        )
+        funnel_columns = ['stage', 'conversion_rate']
+        funnel_formats = {'conversion_rate': '{:.2f}%'}
+    
+    paged_table(
+        functools.partial(frame_page, funnel_calc[funnel_columns], ('funnel', dataset_version('funnel'))),
+        funnel_columns,
+        key="funnel_table",
+        formats=funnel_formats,
+        ascending=True
+    )
     
     st.markdown("---")
     
@@ -693,77 +2565,91 @@ def page_attribution_funnel(data):
         labels=dict(color='Correlation')
     )
     fig.update_layout(height=600, template='plotly_white')
-    st.plotly_chart(fig, use_container_width=True)
+    show_chart(fig, "correlation_matrix")
 
 # =============================================================================
 # PAGE: ML MODEL EVALUATION
 # =============================================================================
+@page("🤖 ML Model Evaluation", 'leads', 'feature_importance', 'learning_curve')
 def page_ml_evaluation(data):
     """ML Model Evaluation - Confusion matrix, ROC, learning curve, feature importance"""
     st.title("🤖 ML Model Evaluation")
     st.markdown("Lead Scoring Model Performance Analysis")
     
-    leads = data['leads']
+    data['leads']  # loads (and validates) the raw table behind the model tables
     feature_imp = data['feature_importance']
     learning = data['learning_curve']
+    thresholds = threshold_table(dataset_version('leads'))
+    curves = model_curves(dataset_version('leads'))
     
     col1, col2 = st.columns(2)
     
     # Confusion Matrix
     with col1:
-        st.subheader("📊 Confusion Matrix")
-        
-        threshold = st.slider(
-            "Classification Threshold",
-            0.0, 1.0, 0.5, 0.05,
-            key="confusion_threshold"
-        )
-        
-        y_true = leads['actual_converted']
-        y_pred = (leads['predicted_probability'] >= threshold).astype(int)
-        
-        cm = confusion_matrix(y_true, y_pred)
-        
-        fig = px.imshow(
-            cm,
-            labels=dict(x="Predicted", y="Actual", color="Count"),
-            x=['Not Converted', 'Converted'],
-            y=['Not Converted', 'Converted'],
-            text_auto=True,
-            color_continuous_scale='Blues',
-            title=f'Confusion Matrix (Threshold: {threshold})',
-            aspect='auto'
-        )
-        fig.update_layout(height=400, template='plotly_white')
-        st.plotly_chart(fig, use_container_width=True)
-        
-        # Calculate metrics
-        tn, fp, fn, tp = cm.ravel()
-        accuracy = (tp + tn) / (tp + tn + fp + fn)
-        precision = tp / (tp + fp) if (tp + fp) > 0 else 0
-        recall = tp / (tp + fn) if (tp + fn) > 0 else 0
-        f1 = 2 * (precision * recall) / (precision + recall) if (precision + recall) > 0 else 0
-        
-        metric_cols = st.columns(4)
-        with metric_cols[0]:
-            st.metric("Accuracy", f"{accuracy:.3f}")
-        with metric_cols[1]:
-            st.metric("Precision", f"{precision:.3f}")
-        with metric_cols[2]:
-            st.metric("Recall", f"{recall:.3f}")
-        with metric_cols[3]:
-            st.metric("F1 Score", f"{f1:.3f}")
+        @fragment
+        def confusion_matrix_section():
+            st.subheader("📊 Confusion Matrix")
+            
+            threshold = st.slider(
+                "Classification Threshold",
+                0.0, 1.0, 0.5, 0.05,
+                key="confusion_threshold"
+            )
+            
+            m = thresholds.metrics(threshold).iloc[0]
+            cm = np.array([[m['tn'], m['fp']], [m['fn'], m['tp']]], dtype=int)
+            
+            def build():
+                fig = px.imshow(
+                    cm,
+                    labels=dict(x="Predicted", y="Actual", color="Count"),
+                    x=['Not Converted', 'Converted'],
+                    y=['Not Converted', 'Converted'],
+                    text_auto=True,
+                    color_continuous_scale='Blues',
+                    title=f'Confusion Matrix (Threshold: {threshold})',
+                    aspect='auto'
+                )
+                fig.update_layout(height=400, template='plotly_white')
+                return fig
+            show_cached_chart("confusion_matrix", (dataset_version('leads'), threshold), build)
+            
+            metric_cols = st.columns(4)
+            with metric_cols[0]:
+                st.metric("Accuracy", f"{m['accuracy']:.3f}")
+            with metric_cols[1]:
+                st.metric("Precision", f"{m['precision']:.3f}")
+            with metric_cols[2]:
+                st.metric("Recall", f"{m['recall']:.3f}")
+            with metric_cols[3]:
+                st.metric("F1 Score", f"{m['f1']:.3f}")
+            
+            # All metrics across thresholds, from the same table
+            if st.checkbox("Show metrics across thresholds", value=False, key="threshold_sweep"):
+                def build():
+                    sweep = thresholds.metrics(np.linspace(0, 1, 101))
+                    fig = px.line(
+                        sweep,
+                        x='threshold',
+                        y=['accuracy', 'precision', 'recall', 'f1'],
+                        title='Model Metrics vs Classification Threshold',
+                        labels={'threshold': 'Threshold', 'value': 'Score', 'variable': 'Metric'}
+                    )
+                    fig.add_vline(x=threshold, line_dash='dash', line_color='gray')
+                    fig.update_layout(height=350, hovermode='x unified', template='plotly_white')
+                    return fig
+                show_cached_chart("threshold_sweep", (dataset_version('leads'), threshold), build)
+        confusion_matrix_section()
     
     # ROC Curve
     with col2:
         st.subheader("📈 ROC Curve & AUC")
         
-        fpr, tpr, thresholds = roc_curve(leads['actual_converted'], leads['predicted_probability'])
-        roc_auc = auc(fpr, tpr)
+        roc_auc = curves['auc']
         
         fig = go.Figure()
         fig.add_trace(go.Scatter(
-            x=fpr, y=tpr,
+            x=curves['fpr'], y=curves['tpr'],
             mode='lines',
             name=f'ROC Curve (AUC = {roc_auc:.3f})',
             line=dict(color='#636EFA', width=3)
@@ -783,7 +2669,7 @@ def page_ml_evaluation(data):
             template='plotly_white',
             legend=dict(x=0.6, y=0.1)
         )
-        st.plotly_chart(fig, use_container_width=True)
+        show_chart(fig, "roc_curve")
         
         st.metric("ROC AUC Score", f"{roc_auc:.3f}")
     
@@ -809,7 +2695,7 @@ def page_ml_evaluation(data):
             color_continuous_scale='Blues'
         )
         fig.update_layout(height=400, showlegend=False, template='plotly_white')
-        st.plotly_chart(fig, use_container_width=True)
+        show_chart(fig, "feature_importance")
     
     # Learning Curve
     with col4:
@@ -845,18 +2731,16 @@ def page_ml_evaluation(data):
             template='plotly_white',
             yaxis=dict(range=[0.4, 1.0])
         )
-        st.plotly_chart(fig, use_container_width=True)
+        show_chart(fig, "learning_curve")
     
     st.markdown("---")
     
     # Precision-Recall Curve (Bonus)
     st.subheader("📊 Precision-Recall Curve")
     
-    precision_vals, recall_vals, _ = precision_recall_curve(leads['actual_converted'], leads['predicted_probability'])
-    
     fig = go.Figure()
     fig.add_trace(go.Scatter(
-        x=recall_vals, y=precision_vals,
+        x=curves['recall'], y=curves['precision'],
         mode='lines',
         name='Precision-Recall',
         line=dict(color='#AB63FA', width=3)
@@ -869,7 +2753,46 @@ def page_ml_evaluation(data):
         height=400,
         template='plotly_white'
     )
-    st.plotly_chart(fig, use_container_width=True)
+    show_chart(fig, "precision_recall")
+
+# =============================================================================
+# STARTUP WARM-UP
+# =============================================================================
+WARM_UP_THREAD = "novamart-warmup"
+
+class _SkipWarmUpThread(logging.Filter):
+    """Drop Streamlit's missing-ScriptRunContext warnings raised by the warm-up thread"""
+    
+    def filter(self, record):
+        return threading.current_thread().name != WARM_UP_THREAD
+
+def warm_up_pages():
+    """Load every dataset and render every page once with default widget values
+
+    Runs outside any session, where Streamlit calls draw nothing and widgets
+    return their defaults, so all it leaves behind is filled data, aggregate
+    and figure caches.
+    """
+    started = time.perf_counter()
+    for i, (title, render) in enumerate(PAGES.items(), 1):
+        start = time.perf_counter()
+        try:
+            data = load_data(render.tables)
+            data.prefetch()
+            render(data)
+        except Exception:
+            logger.exception("Warm-up of %s failed", title)
+            continue
+        logger.info("Warm-up %d/%d: %s ready in %.2fs", i, len(PAGES), title, time.perf_counter() - start)
+    logger.info("Warm-up finished in %.2fs", time.perf_counter() - started)
+
+@st.cache_resource(show_spinner=False)
+def start_warm_up():
+    """Start the warm-up thread (once per process)"""
+    get_logger(get_script_run_ctx.__module__).addFilter(_SkipWarmUpThread())
+    thread = threading.Thread(target=warm_up_pages, name=WARM_UP_THREAD, daemon=True)
+    thread.start()
+    return thread
 
 # =============================================================================
 # MAIN APPLICATION
@@ -877,30 +2800,23 @@ def page_ml_evaluation(data):
 def main():
     """Main application router"""
     
-    # Load data
-    data = load_data()
-    
-    if data is None:
-        st.stop()
-    
     # Sidebar navigation
     page = sidebar()
     
-    # Route to pages
-    if page == "🏠 Executive Overview":
-        page_executive_overview(data)
-    elif page == "📈 Campaign Analytics":
-        page_campaign_analytics(data)
-    elif page == "👥 Customer Insights":
-        page_customer_insights(data)
-    elif page == "📦 Product Performance":
-        page_product_performance(data)
-    elif page == "🗺️ Geographic Analysis":
-        page_geographic_analysis(data)
-    elif page == "🎯 Attribution & Funnel":
-        page_attribution_funnel(data)
-    elif page == "🤖 ML Model Evaluation":
-        page_ml_evaluation(data)
+    # Route to the page, loading only the datasets it declares
+    render = PAGES[page]
+    data = load_data(render.tables)
+    data.prefetch()
+    PROFILER.page = page
+    with PROFILER.span('page', page):
+        render(data)
+    sidebar_timings(page)
+    sidebar_footprint(data)
+    sidebar_figure_cache()
+    
+    # After the first page is served, so its render doesn't compete with the warm-up
+    if WARM_UP:
+        start_warm_up()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,332 @@
+"""
+NovaMart Dashboard Benchmark
+============================
+Headless performance harness for app.py.
+
+Drives every dashboard page (and key widget states) through Streamlit's
+AppTest, at the shipped data size and at scaled-up synthetic sizes, and
+records per scenario:
+    - wall time of navigating to the page with empty in-process caches, of
+      the last widget interaction, and the median warm rerun
+    - peak Python/NumPy memory during a cold run (tracemalloc)
+    - number of heavy pandas operations (groupby, merge, sort, read, ...)
+    - serialized bytes of the Plotly figures sent to the browser
+
+Results are written as JSON lines, one record per (scale, scenario); a
+scenario that raises is recorded with an "error" field and makes the run
+exit non-zero. With --imports a "startup_imports" record is added: the
+import time of a cold bare `python app.py` run, per top-level package.
+
+Usage:
+    python benchmark.py                          # shipped data, all scenarios
+    python benchmark.py --scales 1,10 --output bench.jsonl
+    python benchmark.py --baseline bench.jsonl   # fail on regressions
+    python benchmark.py --imports --scenarios none   # startup import profile only
+"""
+
+import os
+import sys
+import json
+import time
+import subprocess
+import argparse
+import tempfile
+import tracemalloc
+import statistics
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+APP_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+SOURCE_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+# =============================================================================
+# SCENARIOS
+# =============================================================================
+# (name, sidebar page, widget values keyed by widget key or label)
+SCENARIOS = [
+    ("overview_default", "🏠 Executive Overview", {}),
+    ("overview_monthly_roas", "🏠 Executive Overview", {"exec_agg": "Monthly", "channel_metric": "ROAS"}),
+    ("campaigns_default", "📈 Campaign Analytics", {}),
+    ("campaigns_filtered", "📈 Campaign Analytics", {"Select Regions": ["North", "South"]}),
+    ("customers_default", "👥 Customer Insights", {}),
+    ("customers_trend_density", "👥 Customer Insights", {"Show Trend Line": True, "scatter_mode": "Density"}),
+    ("products_default", "📦 Product Performance", {}),
+    ("products_units", "📦 Product Performance", {"treemap_color": "units_sold"}),
+    ("geographic_default", "🗺️ Geographic Analysis", {}),
+    ("geographic_growth", "🗺️ Geographic Analysis", {"geo_metric": "yoy_growth"}),
+    ("attribution_default", "🎯 Attribution & Funnel", {}),
+    ("attribution_linear", "🎯 Attribution & Funnel", {"attribution_model": "linear"}),
+    ("ml_default", "🤖 ML Model Evaluation", {}),
+    ("ml_threshold", "🤖 ML Model Evaluation", {"confusion_threshold": 0.3}),
+]
+
+# pandas entry points counted as "operations"
+PANDAS_OPERATIONS = [
+    (pd, 'read_csv'), (pd, 'read_parquet'), (pd, 'concat'), (pd, 'merge'),
+    (pd.DataFrame, 'groupby'), (pd.Series, 'groupby'),
+    (pd.DataFrame, 'merge'), (pd.DataFrame, 'sort_values'), (pd.Series, 'sort_values'),
+    (pd.DataFrame, 'nlargest'), (pd.DataFrame, 'pivot_table'),
+    (pd.DataFrame, 'take'), (pd.Series, 'isin'), (pd.DataFrame, 'copy'),
+]
+
+# =============================================================================
+# SYNTHETIC DATA
+# =============================================================================
+def scale_dataset(target_dir, factor, seed=0):
+    """Write a copy of data/ with the large tables replicated `factor` times
+
+    Replicas get fresh ids and multiplicative noise on their measures so
+    distributions, unique scores and the product catalog grow with the factor.
+    """
+    rng = np.random.default_rng(seed)
+    os.makedirs(target_dir, exist_ok=True)
+
+    def replicate(df, id_col=None, noisy=(), suffix_col=None):
+        parts = []
+        for k in range(factor):
+            part = df.copy()
+            if k:
+                if id_col:
+                    part[id_col] = part[id_col].astype(str) + f"_{k}"
+                if suffix_col:
+                    part[suffix_col] = part[suffix_col].astype(str) + f" #{k}"
+                for col in noisy:
+                    jitter = rng.normal(1.0, 0.05, len(part))
+                    values = part[col] * jitter
+                    part[col] = values.round().astype(part[col].dtype) if part[col].dtype.kind == 'i' else values.round(2)
+            parts.append(part)
+        return pd.concat(parts, ignore_index=True)
+
+    for filename in os.listdir(SOURCE_DATA_DIR):
+        if not filename.endswith(".csv"):
+            continue
+        df = pd.read_csv(os.path.join(SOURCE_DATA_DIR, filename))
+        if filename == "campaign_performance.csv":
+            df = replicate(df, 'campaign_id', noisy=('impressions', 'clicks', 'conversions', 'spend', 'revenue'))
+            df = df.sort_values('date', kind='stable')
+        elif filename == "customer_data.csv":
+            df = replicate(df, 'customer_id', noisy=('income', 'lifetime_value', 'satisfaction_score'))
+        elif filename == "product_sales.csv":
+            df = replicate(df, 'product_id', noisy=('sales', 'units_sold', 'profit'), suffix_col='product_name')
+        elif filename == "lead_scoring_results.csv":
+            df = replicate(df, 'lead_id')
+            df['predicted_probability'] = (df['predicted_probability'] + rng.normal(0, 0.01, len(df))).clip(0, 1).round(4)
+        elif filename == "customer_journey.csv":
+            df = replicate(df, noisy=('customer_count',))
+        elif filename == "correlation_matrix.csv":
+            df = pd.read_csv(os.path.join(SOURCE_DATA_DIR, filename), index_col=0)
+            df.to_csv(os.path.join(target_dir, filename))
+            continue
+        df.to_csv(os.path.join(target_dir, filename), index=False)
+
+# =============================================================================
+# MEASUREMENT
+# =============================================================================
+@contextmanager
+def count_pandas_operations():
+    """Count calls to the PANDAS_OPERATIONS entry points while the block runs"""
+    counter = {'count': 0}
+    originals = []
+    for owner, name in PANDAS_OPERATIONS:
+        original = getattr(owner, name)
+        originals.append((owner, name, original))
+
+        def counted(*args, __original=original, **kwargs):
+            counter['count'] += 1
+            return __original(*args, **kwargs)
+
+        setattr(owner, name, counted)
+    try:
+        yield counter
+    finally:
+        for owner, name, original in originals:
+            setattr(owner, name, original)
+
+def find_widget(at, key_or_label):
+    """Locate a widget in the rendered app by key, falling back to its label"""
+    for kind in ('selectbox', 'multiselect', 'slider', 'checkbox', 'radio', 'date_input', 'text_input', 'number_input', 'toggle'):
+        for widget in getattr(at, kind):
+            if widget.key == key_or_label or getattr(widget, 'label', None) == key_or_label:
+                return widget
+    raise KeyError(f"Widget '{key_or_label}' not found")
+
+def timed_run(at, label):
+    """Rerun the app, raising if the script failed; returns wall time"""
+    start = time.perf_counter()
+    at.run()
+    elapsed = time.perf_counter() - start
+    errors = [str(e.value) for e in at.exception]
+    if errors:
+        raise RuntimeError(f"{label}: {errors[0]}")
+    return elapsed
+
+def drive(at, page, widgets):
+    """Navigate to a page, then apply widget values one rerun at a time
+
+    Returns the navigation time and the time of the last widget rerun (None
+    when the scenario sets no widgets).
+    """
+    at.sidebar.radio[0].set_value(page)
+    navigation = timed_run(at, page)
+    interaction = None
+    for key, value in widgets.items():
+        find_widget(at, key).set_value(value)
+        interaction = timed_run(at, f"{page} / {key}")
+    return navigation, interaction
+
+def figure_bytes(at):
+    """Serialized size of every Plotly figure in the current render"""
+    return sum(len(chart.proto.spec.encode()) for chart in at.get('plotly_chart'))
+
+def clear_caches():
+    """Drop Streamlit's in-process caches so the next run is cold"""
+    st.cache_data.clear()
+    st.cache_resource.clear()
+
+def run_scenario(name, page, widgets, warm_runs):
+    """Measure one scenario
+
+    A timing pass (cold navigation, then the widget interactions) runs
+    untraced; a second cold pass runs under tracemalloc and the pandas
+    operation counter, then the warm reruns are timed.
+    """
+    at = AppTest.from_file(APP_FILE, default_timeout=600)
+    at.run()
+    clear_caches()
+    cold, interaction = drive(at, page, widgets)
+
+    at = AppTest.from_file(APP_FILE, default_timeout=600)
+    at.run()
+    clear_caches()
+    tracemalloc.start()
+    with count_pandas_operations() as ops:
+        drive(at, page, widgets)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    warm = []
+    for _ in range(warm_runs):
+        start = time.perf_counter()
+        at.run()
+        warm.append(time.perf_counter() - start)
+
+    return {
+        'scenario': name,
+        'page': page,
+        'widgets': widgets,
+        'cold_seconds': round(cold, 4),
+        'interaction_seconds': round(interaction, 4) if interaction is not None else None,
+        'warm_seconds': round(statistics.median(warm), 4) if warm else None,
+        'peak_memory_bytes': peak,
+        'pandas_operations': ops['count'],
+        'figure_bytes': figure_bytes(at),
+        'figures': len(at.get('plotly_chart')),
+    }
+
+# =============================================================================
+# STARTUP IMPORTS
+# =============================================================================
+def import_profile(top=15):
+    """Import time of a bare `python app.py` run (default page only), via -X importtime
+
+    Each module's own import time is attributed to its top-level package.
+    """
+    env = dict(os.environ, NOVAMART_WARMUP="0")
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", APP_FILE], capture_output=True, text=True,
+                          env=env, cwd=os.path.dirname(APP_FILE))
+    wall = time.perf_counter() - start
+    packages = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        package = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0) + int(self_us)
+    ranked = sorted(packages.items(), key=lambda item: item[1], reverse=True)
+    return {
+        'scenario': 'startup_imports',
+        'import_seconds': round(sum(packages.values()) / 1e6, 4),
+        'wall_seconds': round(wall, 4),
+        'packages': {name: round(us / 1e6, 4) for name, us in ranked[:top]},
+    }
+
+# =============================================================================
+# REGRESSION CHECK
+# =============================================================================
+COMPARED_METRICS = ['warm_seconds', 'interaction_seconds', 'peak_memory_bytes', 'figure_bytes', 'import_seconds']
+
+def compare(results, baseline_file, tolerance):
+    """Report metrics that regressed more than `tolerance` vs a previous run; returns the count"""
+    with open(baseline_file) as f:
+        baseline = {(r['scale'], r['scenario']): r for r in map(json.loads, f) if r.get('scenario')}
+    regressions = 0
+    for result in results:
+        before = baseline.get((result['scale'], result['scenario']))
+        if not before:
+            continue
+        for metric in COMPARED_METRICS:
+            old, new = before.get(metric), result.get(metric)
+            if old and new and new > old * (1 + tolerance):
+                regressions += 1
+                print(f"REGRESSION {result['scenario']} @x{result['scale']}: {metric} {old} -> {new}", file=sys.stderr)
+    return regressions
+
+# =============================================================================
+# MAIN
+# =============================================================================
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the NovaMart dashboard pages")
+    parser.add_argument("--scales", default="1", help="comma-separated data scale factors (default: 1)")
+    parser.add_argument("--scenarios", default="", help="comma-separated scenario names (default: all)")
+    parser.add_argument("--warm-runs", type=int, default=3, help="warm reruns per scenario (default: 3)")
+    parser.add_argument("--output", help="write JSON lines here instead of stdout")
+    parser.add_argument("--baseline", help="JSON lines from a previous run to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression (default: 0.25)")
+    parser.add_argument("--imports", action="store_true", help="also profile the import time of a cold app start")
+    args = parser.parse_args()
+
+    # Cold runs must not be warmed behind the harness's back
+    os.environ["NOVAMART_WARMUP"] = "0"
+    selected = set(filter(None, args.scenarios.split(",")))
+    scenarios = [s for s in SCENARIOS if not selected or s[0] in selected]
+    out = open(args.output, "w") if args.output else sys.stdout
+    results = []
+    failures = 0
+    
+    if args.imports:
+        result = {'scale': 1, **import_profile()}
+        results.append(result)
+        out.write(json.dumps(result, ensure_ascii=False) + "\n")
+        out.flush()
+
+    for scale in [int(x) for x in args.scales.split(",")]:
+        with tempfile.TemporaryDirectory() as tmp:
+            if scale == 1:
+                data_dir = SOURCE_DATA_DIR
+            else:
+                data_dir = os.path.join(tmp, "data")
+                scale_dataset(data_dir, scale)
+            os.environ["NOVAMART_DATA_DIR"] = data_dir
+
+            for name, page, widgets in scenarios:
+                try:
+                    result = {'scale': scale, **run_scenario(name, page, widgets, args.warm_runs)}
+                except Exception as e:
+                    failures += 1
+                    result = {'scale': scale, 'scenario': name, 'page': page, 'widgets': widgets, 'error': str(e)}
+                results.append(result)
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+
+    if out is not sys.stdout:
+        out.close()
+    if failures or (args.baseline and compare(results, args.baseline, args.tolerance)):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
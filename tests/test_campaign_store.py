@@ -0,0 +1,94 @@
+import os
+
+import pandas as pd
+import pytest
+
+import app
+
+CAMPAIGNS = app.DATASETS['campaigns']['file']
+SHIPPED = os.path.join(app.DATA_DIR, CAMPAIGNS)
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(app, 'DATA_DIR', str(tmp_path))
+    monkeypatch.setattr(app, 'CACHE_DIR', str(tmp_path / '.cache'))
+    return tmp_path
+
+
+def write(path, data, mode='wb'):
+    with open(path, mode) as f:
+        f.write(data)
+    # A distinct mtime per write, so every write is a new dataset version
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+def assert_same_snapshot(snapshot, rebuilt):
+    pd.testing.assert_frame_equal(snapshot.frame, rebuilt.frame)
+    pd.testing.assert_frame_equal(snapshot.rollup, rebuilt.rollup, check_exact=False)
+
+
+@pytest.mark.parametrize("loaded_before_half_row", [True, False])
+# Cut 3 bytes into the clicks or the revenue field of the last row
+@pytest.mark.parametrize("cut_field", ['clicks', 'revenue'])
+def test_half_written_row_is_ingested_once_complete(data_dir, loaded_before_half_row, cut_field):
+    with open(SHIPPED, 'rb') as f:
+        lines = f.read().splitlines(keepends=True)
+    path = data_dir / CAMPAIGNS
+    head, appended = b''.join(lines[:-5]), b''.join(lines[-5:])
+    field = lines[0].decode().split(',').index(cut_field)
+    cut = len(appended) - len(lines[-1]) + len(b','.join(lines[-1].split(b',')[:field])) + 4
+
+    write(path, head)
+    store = app.CampaignStore(str(path))
+    if loaded_before_half_row:
+        store.refresh()
+    write(path, appended[:cut], mode='ab')
+    partial = store.refresh()
+    assert len(partial.frame) == len(lines) - 2
+    write(path, appended[cut:], mode='ab')
+    snapshot = store.refresh()
+
+    rebuilt = app.CampaignStore(str(path)).refresh()
+    assert len(rebuilt.frame) == len(lines) - 1
+    assert_same_snapshot(snapshot, rebuilt)
+
+
+def assert_same_indexes(snapshot, rebuilt):
+    prefix, fresh = snapshot.index(app.PrefixIndex), app.PrefixIndex(rebuilt.rollup)
+    assert (prefix.first, prefix.last, prefix.days) == (fresh.first, fresh.last, fresh.days)
+    assert prefix.cumulative.shape == fresh.cumulative.shape
+    assert abs(prefix.cumulative - fresh.cumulative).max() <= 1e-6 * abs(fresh.cumulative).max()
+    index, fresh = snapshot.index(app.CampaignIndex), app.CampaignIndex(rebuilt.rollup)
+    assert (index.dates == fresh.dates).all()
+    for col, bitmaps in fresh.bitmaps.items():
+        assert index.bitmaps[col].keys() == bitmaps.keys()
+        for value, bits in bitmaps.items():
+            assert (index.bitmaps[col][value] == bits).all()
+
+
+@pytest.mark.parametrize("appended", ['new_days', 'past_days'])
+def test_indexes_are_extended_on_append(data_dir, appended):
+    with open(SHIPPED, 'rb') as f:
+        header, *rows = f.read().splitlines(keepends=True)
+    if appended == 'new_days':
+        rows.sort()
+        kept, held = rows[:-300], rows[-300:]
+    else:
+        # Every 20th row: the appends touch days all over the history
+        kept, held = [row for i, row in enumerate(rows) if i % 20], rows[::20]
+    path = data_dir / CAMPAIGNS
+    write(path, header + b''.join(kept))
+    store = app.CampaignStore(str(path))
+    snapshot = store.refresh()
+    for kind in (app.PrefixIndex, app.CampaignIndex):
+        snapshot.index(kind)
+
+    for batch in (held[:99], held[99:100], held[100:]):
+        write(path, b''.join(batch), mode='ab')
+        snapshot = store.refresh()
+        assert set(snapshot._base) == {app.PrefixIndex, app.CampaignIndex}
+        rebuilt = app.CampaignStore(str(path)).refresh()
+        assert_same_snapshot(snapshot, rebuilt)
+        assert_same_indexes(snapshot, rebuilt)
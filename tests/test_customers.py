@@ -0,0 +1,15 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import app
+
+
+@pytest.mark.parametrize("bin_width", [1, 2, 3, 4, 5, 10])
+def test_age_histogram_matches_left_closed_bins(bin_width):
+    version = app.dataset_version('customers')
+    edges, counts, _ = app.age_histogram(version, bin_width)
+    ages = app.load_table('customers', version)['age']
+    expected = pd.cut(ages, edges, right=False).value_counts(sort=False).to_numpy()
+    assert np.array_equal(counts, expected)
+    assert counts.sum() == len(ages)